@@ -0,0 +1,82 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+RECIPES_GENERATION_KEY = 'generation:recipes'
+USER_GENERATION_KEY = 'generation:user:{}'
+INGREDIENTS_GENERATION_KEY = 'generation:ingredients'
+RECIPE_INGREDIENTS_GENERATION_KEY = 'generation:recipe-ingredients'
+RECIPE_INGREDIENTS_CHANGES_KEY = 'recipe-ingredients-changes:{}'
+TAGS_GENERATION_KEY = 'generation:tags'
+RECIPE_DETAIL_KEY = 'recipe-detail:{}'
+
+
+def get_generation(key):
+    """
+    Возвращает текущее поколение данных для ключа.
+    Поколение входит в ключи кэша, поэтому его смена
+    делает недействительными все записи, построенные на старом.
+    """
+    generation = cache.get(key)
+    if generation is not None:
+        return generation
+    generation = time.time_ns()
+    if cache.add(key, generation, None):
+        return generation
+    return cache.get(key, generation)
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_generation_on_commit(key):
+    transaction.on_commit(lambda: bump_generation(key))
+
+
+def record_recipe_ingredients_changes(recipe_ids):
+    """
+    После фиксации транзакции сдвигает поколение составов рецептов
+    и сохраняет под новым номером id изменённых рецептов.
+    По ним индексы в памяти обновляют только эти рецепты.
+    """
+    recipe_ids = list(recipe_ids)
+
+    def record():
+        try:
+            generation = cache.incr(RECIPE_INGREDIENTS_GENERATION_KEY)
+        except ValueError:
+            # Поколения не было, индексы перестроятся целиком.
+            cache.set(RECIPE_INGREDIENTS_GENERATION_KEY, time.time_ns(), None)
+            return
+        cache.set(
+            RECIPE_INGREDIENTS_CHANGES_KEY.format(generation),
+            recipe_ids,
+            settings.PANTRY_INDEX_MAX_AGE
+        )
+
+    transaction.on_commit(record)
+
+
+def make_key(prefix, *parts):
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Удаляет из кэша сохранённые данные рецептов.
+    Удаление откладывается до фиксации транзакции, чтобы параллельный
+    запрос не успел закэшировать ещё не зафиксированное состояние.
+    """
+    keys = [RECIPE_DETAIL_KEY.format(recipe_id) for recipe_id in recipe_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
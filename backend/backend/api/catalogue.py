@@ -0,0 +1,266 @@
+import json
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingList,
+                             ShoppingListIngredient, SimilarityBucket,
+                             Subscription, Tag)
+from foodgram.utils import batched
+from users.models import User
+
+from .cache import (INGREDIENTS_GENERATION_KEY,
+                    RECIPE_INGREDIENTS_GENERATION_KEY, RECIPES_GENERATION_KEY,
+                    TAGS_GENERATION_KEY, USER_GENERATION_KEY, bump_generation)
+
+USER_FIELDS = (
+    'password', 'last_login', 'is_superuser', 'is_staff', 'is_active',
+    'date_joined', 'username', 'email', 'role', 'first_name', 'last_name',
+)
+TAG_FIELDS = ('name', 'slug', 'color')
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+RECIPE_FIELDS = ('name', 'author_id', 'image', 'text', 'cooking_time')
+RELATIONS = {
+    'favorite': (Favorite, 'user_id', 'recipe_id'),
+    'shopping_list': (ShoppingList, 'user_id', 'recipe_id'),
+    'subscription': (Subscription, 'user_id', 'author_id'),
+}
+
+
+def dump(file, batch_size=1000):
+    """
+    Пишет каталог в file построчно в формате NDJSON.
+    Сначала идут пользователи, тэги и ингредиенты, затем рецепты
+    с тэгами и ингредиентами, затем избранное, списки покупок и подписки,
+    поэтому при загрузке все ссылки указывают на уже прочитанные записи.
+    Возвращает число записей по типам.
+    """
+    def write(kind, records):
+        count = 0
+        for count, record in enumerate(records, 1):
+            file.write(json.dumps(
+                {'type': kind, **record},
+                cls=DjangoJSONEncoder,
+                ensure_ascii=False
+            ))
+            file.write('\n')
+        return count
+
+    def rows(model, *fields):
+        return model.objects.order_by('id').values('id', *fields).iterator(
+            chunk_size=batch_size
+        )
+
+    sections = [
+        ('user', rows(User, *USER_FIELDS)),
+        ('tag', rows(Tag, *TAG_FIELDS)),
+        ('ingredient', rows(Ingredient, *INGREDIENT_FIELDS)),
+        ('recipe', recipes(batch_size)),
+    ] + [
+        (kind, rows(*relation)) for kind, relation in RELATIONS.items()
+    ]
+    return {kind: write(kind, records) for kind, records in sections}
+
+
+def recipes(batch_size):
+    """
+    Рецепты пачками по возрастанию id вместе с id тэгов
+    и парами (id ингредиента, количество).
+    """
+    last_id = 0
+    while True:
+        batch = list(Recipe.objects.filter(id__gt=last_id).order_by(
+            'id').values('id', *RECIPE_FIELDS)[:batch_size])
+        if not batch:
+            return
+        ids = [recipe['id'] for recipe in batch]
+        tags = {recipe_id: [] for recipe_id in ids}
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('id').values_list('recipe_id', 'tag_id'):
+            tags[recipe_id].append(tag_id)
+        ingredients = {recipe_id: [] for recipe_id in ids}
+        for recipe_id, *item in RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).order_by('id').values_list('recipe_id', 'ingredient_id', 'amount'):
+            ingredients[recipe_id].append(item)
+        for recipe in batch:
+            yield {
+                **recipe,
+                'tags': tags[recipe['id']],
+                'ingredients': ingredients[recipe['id']],
+            }
+        last_id = ids[-1]
+
+
+class CatalogueLoader:
+    """
+    Загружает каталог, выгруженный функцией dump.
+    Записи читаются пачками, каждая пачка сохраняется bulk_create
+    в своей транзакции. Id из файла сопоставляются с id в базе
+    по уникальным полям: логину, slug, паре название-единица
+    и названию рецепта. Уже существующие записи не дублируются,
+    поэтому повторная загрузка того же файла ничего не меняет.
+    """
+
+    def __init__(self, batch_size=1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.ids = {'user': {}, 'tag': {}, 'ingredient': {}, 'recipe': {}}
+        self.created = {}
+        self.skipped = 0
+        self.user_ids = set()
+
+    def load(self, lines):
+        records = (json.loads(line) for line in lines if line.strip())
+        for kind, group in groupby(records, key=itemgetter('type')):
+            handler = getattr(self, f'load_{kind}s', None)
+            if kind in RELATIONS:
+                handler = self.load_relations
+            if handler is None:
+                raise ValueError(f'Unknown record type: {kind}')
+            for batch in batched(group, self.batch_size):
+                with transaction.atomic():
+                    created = handler(kind, batch)
+                self.created[kind] = self.created.get(kind, 0) + created
+                if self.progress:
+                    self.progress(kind, self.created[kind])
+        self.finish()
+        return self.created
+
+    def remap(self, kind, model, key, batch, fields):
+        """
+        Создаёт недостающие записи и запоминает id по значению key.
+        Возвращает значения key, которых до загрузки в базе не было.
+        """
+        values = [record[key] for record in batch]
+        existing = set(model.objects.filter(
+            **{f'{key}__in': values}
+        ).values_list(key, flat=True))
+        model.objects.bulk_create(
+            (
+                model(**{field: record[field] for field in fields})
+                for record in batch if record[key] not in existing
+            ),
+            ignore_conflicts=True
+        )
+        ids = dict(model.objects.filter(
+            **{f'{key}__in': values}
+        ).values_list(key, 'id'))
+        self.remember(kind, batch, ids, itemgetter(key))
+        return set(ids) - existing
+
+    def remember(self, kind, batch, ids, key):
+        for record in batch:
+            pk = ids.get(key(record))
+            if pk is None:
+                self.skipped += 1
+            else:
+                self.ids[kind][record['id']] = pk
+
+    def load_users(self, kind, batch):
+        return len(self.remap(kind, User, 'username', batch, USER_FIELDS))
+
+    def load_tags(self, kind, batch):
+        return len(self.remap(kind, Tag, 'slug', batch, TAG_FIELDS))
+
+    def load_ingredients(self, kind, batch):
+        key = itemgetter('name', 'measurement_unit')
+        existing = self.ingredient_ids(batch)
+        Ingredient.objects.load(
+            pair for pair in map(key, batch) if pair not in existing
+        )
+        ids = self.ingredient_ids(batch)
+        self.remember(kind, batch, ids, key)
+        return len(set(ids) - set(existing))
+
+    def ingredient_ids(self, batch):
+        return {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in={record['name'] for record in batch}
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+
+    def load_recipes(self, kind, batch):
+        authors = self.ids['user']
+        valid = []
+        for record in batch:
+            if record['author_id'] in authors:
+                record['author_id'] = authors[record['author_id']]
+                valid.append(record)
+            else:
+                self.skipped += 1
+        created = self.remap(kind, Recipe, 'name', valid, RECIPE_FIELDS)
+        # Состав уже существовавших рецептов не трогается.
+        recipe_ids, tags, ingredients = [], [], []
+        for record in valid:
+            if record['name'] not in created:
+                continue
+            recipe_id = self.ids[kind][record['id']]
+            recipe_ids.append(recipe_id)
+            tags.extend(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in map(self.ids['tag'].get, record['tags'])
+                if tag_id is not None
+            )
+            ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=self.ids['ingredient'][ingredient_id],
+                    amount=amount
+                )
+                for ingredient_id, amount in record['ingredients']
+                if ingredient_id in self.ids['ingredient']
+            )
+        Recipe.tags.through.objects.bulk_create(tags, ignore_conflicts=True)
+        RecipeIngredient.objects.bulk_create(
+            ingredients, ignore_conflicts=True
+        )
+        SimilarityBucket.objects.update_recipes(recipe_ids)
+        return len(recipe_ids)
+
+    def load_relations(self, kind, batch):
+        model, user_field, target_field = RELATIONS[kind]
+        targets = self.ids['user' if target_field == 'author_id' else 'recipe']
+        pairs = set()
+        for record in batch:
+            user_id = self.ids['user'].get(record[user_field])
+            target_id = targets.get(record[target_field])
+            if user_id is None or target_id is None:
+                self.skipped += 1
+            else:
+                pairs.add((user_id, target_id))
+        pairs -= set(model.objects.filter(**{
+            f'{user_field}__in': {user_id for user_id, _ in pairs},
+            f'{target_field}__in': {target_id for _, target_id in pairs},
+        }).values_list(user_field, target_field))
+        model.objects.bulk_create(
+            (
+                model(**{user_field: user_id, target_field: target_id})
+                for user_id, target_id in pairs
+            ),
+            ignore_conflicts=True
+        )
+        if model is not Subscription:
+            self.user_ids.update(user_id for user_id, _ in pairs)
+        return len(pairs)
+
+    def finish(self):
+        """
+        Пересчитывает данные, которые bulk_create не обновляет:
+        суммы списков покупок, ленты подписок и кэш.
+        Счётчики пересчитывает команда recount_counters.
+        """
+        if not any(self.created.values()):
+            return
+        user_ids = list(self.user_ids)
+        ShoppingListIngredient.objects.rebuild(user_ids, self.batch_size)
+        FeedEntry.objects.rebuild(batch_size=self.batch_size)
+        for key in (RECIPES_GENERATION_KEY, INGREDIENTS_GENERATION_KEY,
+                    RECIPE_INGREDIENTS_GENERATION_KEY, TAGS_GENERATION_KEY):
+            bump_generation(key)
+        for user_id in user_ids:
+            bump_generation(USER_GENERATION_KEY.format(user_id))
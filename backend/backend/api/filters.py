@@ -1,17 +1,65 @@
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 from django_filters import rest_framework as filters
-from foodgram.models import Ingredient, Recipe, Tag
+from foodgram.models import Ingredient, Recipe
+
+from .indexes import tag_index
+
+
+def filter_by_name(queryset, value, *ordering):
+    """
+    Поиск по вхождению подстроки в название.
+    Совпадения с начала названия идут первыми.
+    """
+    return queryset.filter(name__icontains=value).annotate(
+        name_rank=Case(
+            When(name__istartswith=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('name_rank', *ordering)
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_index.get()]
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags'
     )
+    name = filters.CharFilter(method='get_name')
+    search = filters.CharFilter(method='get_search')
     is_favorited = filters.NumberFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
+    ordering = filters.OrderingFilter(
+        fields=('favorites_count', 'shopping_count', 'id')
+    )
+
+    def get_name(self, queryset, name, value):
+        return filter_by_name(queryset, value, '-id')
+
+    def get_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тэгов.
+        Slug переводятся в id по индексу в памяти, условие проверяется
+        подзапросом EXISTS, поэтому рецепты не дублируются
+        и не нужен DISTINCT.
+        """
+        slugs = tag_index.get()
+        return queryset.annotate(has_tags=Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[slugs[slug] for slug in value]
+            )
+        )).filter(has_tags=True)
+
+    def get_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return queryset.search(value).order_by('-search_rank', '-id')
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_anonymous:
@@ -35,14 +83,20 @@ class RecipeFilter(filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags',
+            'author',
+            'name',
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
+    name = filters.CharFilter(method='get_name')
+
+    def get_name(self, queryset, name, value):
+        return filter_by_name(queryset, value, 'name')
 
     class Meta:
         model = Ingredient
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from foodgram.models import Recipe
+from PIL import Image, ImageOps
+
+from .cache import RECIPE_DETAIL_KEY
+
+RENDITIONS_DIR = 'recipes/renditions'
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def load_renditions(recipe):
+    """
+    Возвращает имена файлов уменьшенных копий картинки рецепта.
+    Копии, построенные для прежней картинки, не возвращаются.
+    """
+    if not recipe.image_renditions:
+        return None
+    renditions = json.loads(recipe.image_renditions)
+    if renditions.pop('source', None) != recipe.image.name:
+        return None
+    return renditions
+
+
+def build_urls(renditions, build_url):
+    return {
+        name: {
+            extension: build_url(file_name)
+            for extension, file_name in files.items()
+        }
+        for name, files in renditions.items()
+    }
+
+
+def rendition_urls(recipe, request=None):
+    """
+    Ссылки на уменьшенные копии по размерам и форматам.
+    Пока копии не построены, возвращается None
+    и клиент использует исходную картинку.
+    """
+    renditions = load_renditions(recipe)
+    if renditions is None:
+        return None
+    urls = build_urls(renditions, default_storage.url)
+    if request is None:
+        return urls
+    return absolute_urls(urls, request)
+
+
+def absolute_urls(urls, request):
+    if urls is None:
+        return None
+    return build_urls(urls, request.build_absolute_uri)
+
+
+def make_renditions(image_name):
+    """
+    Сохраняет копии картинки каждого размера в каждом формате.
+    Картинка обрезается по центру под пропорции размера.
+    """
+    with default_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    renditions = {'source': image_name}
+    for name, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        renditions[name] = {}
+        for extension, image_format in settings.RECIPE_IMAGE_FORMATS.items():
+            content = BytesIO()
+            resized.save(
+                content,
+                image_format,
+                quality=settings.RECIPE_IMAGE_QUALITY
+            )
+            renditions[name][extension] = default_storage.save(
+                f'{RENDITIONS_DIR}/{stem}_{name}.{extension}',
+                ContentFile(content.getvalue())
+            )
+    return renditions
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Строит уменьшенные копии и сохраняет их имена в рецепте.
+    Если картинку успели заменить, результат отбрасывается:
+    для новой картинки уже запланирована своя обработка.
+    """
+    try:
+        renditions = make_renditions(image_name)
+        updated = Recipe.objects.filter(
+            pk=recipe_id,
+            image=image_name
+        ).update(image_renditions=json.dumps(renditions))
+        if updated:
+            cache.delete(RECIPE_DETAIL_KEY.format(recipe_id))
+    except Exception:
+        logger.exception('Failed to process image of recipe %s', recipe_id)
+    finally:
+        if settings.RECIPE_IMAGE_ASYNC:
+            connection.close()
+
+
+def schedule_renditions(recipe):
+    """
+    Ставит обработку картинки в очередь после фиксации транзакции,
+    чтобы не задерживать запрос и не читать незафиксированные данные.
+    """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if settings.RECIPE_IMAGE_ASYNC:
+        transaction.on_commit(lambda: executor.submit(
+            process_recipe_image, recipe_id, image_name
+        ))
+    else:
+        transaction.on_commit(
+            lambda: process_recipe_image(recipe_id, image_name)
+        )
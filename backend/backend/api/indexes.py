@@ -0,0 +1,299 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from foodgram.models import Ingredient, RecipeIngredient, Tag
+
+from .cache import (INGREDIENTS_GENERATION_KEY, RECIPE_INGREDIENTS_CHANGES_KEY,
+                    RECIPE_INGREDIENTS_GENERATION_KEY, TAGS_GENERATION_KEY,
+                    get_generation)
+
+
+def fold(value):
+    """
+    Приводит строку к виду для сравнения без учёта регистра.
+    Буква «ё» приравнивается к «е».
+    """
+    return value.casefold().replace('ё', 'е')
+
+
+class LazyIndex:
+    """
+    Индекс в памяти процесса.
+    Строится при первом обращении и перестраивается, когда в кэше
+    меняется поколение данных по ключу generation_key или индекс
+    старше, чем указано в настройке max_age_setting.
+    """
+    generation_key = None
+    max_age_setting = 'IN_MEMORY_INDEX_MAX_AGE'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._built_at = None
+        self._data = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def is_expired(self):
+        return (
+            self._data is None
+            or time.monotonic() - self._built_at
+            >= getattr(settings, self.max_age_setting)
+        )
+
+    def is_stale(self, generation):
+        return self._generation != generation or self.is_expired()
+
+    def refresh(self, generation):
+        self._data = self.build()
+        self._generation = generation
+        self._built_at = time.monotonic()
+
+    def get(self):
+        generation = get_generation(self.generation_key)
+        if self.is_stale(generation):
+            with self._lock:
+                if self.is_stale(generation):
+                    self.refresh(generation)
+        return self._data
+
+
+class IngredientPrefixIndex(LazyIndex):
+    """
+    Отсортированный список названий ингредиентов.
+    Совпадения с начала названия ищутся бинарным поиском,
+    после них добавляются совпадения по подстроке.
+    """
+    generation_key = INGREDIENTS_GENERATION_KEY
+
+    def build(self):
+        rows = sorted(
+            (fold(name), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for key, name, pk, measurement_unit in rows
+        ]
+        return keys, items
+
+    def search(self, value, limit=None):
+        keys, items = self.get()
+        value = fold(value)
+        start = bisect_left(keys, value)
+        end = start
+        while end < len(keys) and keys[end].startswith(value):
+            end += 1
+        result = items[start:end]
+        if limit is None or len(result) < limit:
+            result.extend(
+                items[position] for position, key in enumerate(keys)
+                if value in key and not start <= position < end
+            )
+        return result[:limit]
+
+
+class Pantry:
+    """
+    Данные PantryIndex.
+    Рецепты пронумерованы по возрастанию id, для каждого ингредиента
+    хранится компактный массив номеров рецептов с ним,
+    для каждого рецепта - число его ингредиентов. Состав рецепта
+    лежит в общем массиве flat с позиции offsets[номер], составы
+    изменённых после построения рецептов - в словаре changed.
+    В short собраны номера рецептов, в которых не больше
+    PANTRY_MAX_MISSING ингредиентов.
+    """
+
+    def __init__(self, recipe_ids, totals, offsets, flat, postings,
+                 changed=None, short=None):
+        self.recipe_ids = recipe_ids
+        self.totals = totals
+        self.offsets = offsets
+        self.flat = flat
+        self.postings = postings
+        self.changed = changed or {}
+        if short is None:
+            short = self.find_short(range(len(totals)))
+        self.short = short
+
+    @classmethod
+    def build(cls):
+        recipe_ids = array('q')
+        totals = array('H')
+        offsets = array('L')
+        flat = array('L')
+        postings = defaultdict(lambda: array('L'))
+        rows = RecipeIngredient.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        for recipe_id, ingredient_id in rows.iterator():
+            if not recipe_ids or recipe_ids[-1] != recipe_id:
+                recipe_ids.append(recipe_id)
+                totals.append(0)
+                offsets.append(len(flat))
+            totals[-1] += 1
+            flat.append(ingredient_id)
+            postings[ingredient_id].append(len(recipe_ids) - 1)
+        return cls(recipe_ids, totals, offsets, flat, dict(postings))
+
+    def find_short(self, positions):
+        return frozenset(
+            position for position in positions
+            if 0 < self.totals[position] <= settings.PANTRY_MAX_MISSING
+        )
+
+    def ingredients(self, position):
+        if position in self.changed:
+            return self.changed[position]
+        start = self.offsets[position]
+        return self.flat[start:start + self.totals[position]]
+
+    def position(self, recipe_id):
+        position = bisect_left(self.recipe_ids, recipe_id)
+        if (
+            position < len(self.recipe_ids)
+            and self.recipe_ids[position] == recipe_id
+        ):
+            return position
+        return None
+
+    def updated(self, recipe_ids):
+        """
+        Копия данных с новыми составами рецептов recipe_ids.
+        Копируются только списки номеров и затронутые массивы,
+        поэтому обновление не читает всю таблицу составов.
+        Возвращает None, если новый рецепт нельзя добавить в конец
+        нумерации и индекс нужно построить заново.
+        """
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        last_id = self.recipe_ids[-1] if self.recipe_ids else 0
+        new_ids = sorted(
+            recipe_id for recipe_id in current
+            if self.position(recipe_id) is None
+        )
+        if new_ids and new_ids[0] < last_id:
+            return None
+        data = Pantry(
+            self.recipe_ids + array('q', new_ids),
+            self.totals + array('H', [0] * len(new_ids)),
+            self.offsets + array('L', [len(self.flat)] * len(new_ids)),
+            self.flat,
+            dict(self.postings),
+            dict(self.changed),
+            self.short
+        )
+        positions = []
+        for recipe_id in recipe_ids:
+            position = data.position(recipe_id)
+            if position is None:
+                continue
+            old = set(data.ingredients(position))
+            new = current.get(recipe_id, set())
+            for ingredient_id in old - new:
+                data.postings[ingredient_id] = array('L', (
+                    item for item in data.postings[ingredient_id]
+                    if item != position
+                ))
+            for ingredient_id in new - old:
+                data.postings[ingredient_id] = data.postings.get(
+                    ingredient_id, array('L')
+                ) + array('L', [position])
+            data.totals[position] = len(new)
+            data.changed[position] = tuple(new)
+            positions.append(position)
+        data.short = (
+            data.short - set(positions) | data.find_short(positions)
+        )
+        return data
+
+
+class PantryIndex(LazyIndex):
+    """
+    Инвертированный индекс ингредиент -> рецепты.
+    Изменения составов применяются по рецептам: при каждом изменении
+    поколение в кэше сдвигается на единицу, а под новым номером
+    записываются id изменённых рецептов. Индекс перечитывает только
+    их и подменяет данные обновлённой копией.
+    """
+    generation_key = RECIPE_INGREDIENTS_GENERATION_KEY
+    max_age_setting = 'PANTRY_INDEX_MAX_AGE'
+
+    def build(self):
+        return Pantry.build()
+
+    def refresh(self, generation):
+        data = None
+        if not self.is_expired():
+            data = self.apply_changes(generation)
+        if data is None:
+            super().refresh(generation)
+            return
+        self._data = data
+        self._generation = generation
+
+    def apply_changes(self, generation):
+        count = generation - self._generation
+        if not 0 < count <= settings.PANTRY_INDEX_MAX_CHANGES:
+            return None
+        keys = [
+            RECIPE_INGREDIENTS_CHANGES_KEY.format(number)
+            for number in range(self._generation + 1, generation + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return None
+        return self._data.updated(set(chain.from_iterable(changes.values())))
+
+    def match(self, ingredient_ids, max_missing):
+        """
+        Рецепты, которым не хватает не больше max_missing ингредиентов.
+        Совпадения считаются подсчётом номеров рецептов по массивам
+        ингредиентов из запроса. Рецепты без общих ингредиентов
+        с запросом попадают в выдачу, если в них не больше
+        max_missing ингредиентов. Возвращает пары (id рецепта,
+        число недостающих ингредиентов): сначала рецепты,
+        которые можно приготовить целиком, среди равных - новые.
+        """
+        data = self.get()
+        found = Counter(chain.from_iterable(
+            data.postings.get(ingredient_id, ())
+            for ingredient_id in set(ingredient_ids)
+        ))
+        for position in data.short:
+            found.setdefault(position, 0)
+        matches = sorted(
+            (data.totals[position] - count, -data.recipe_ids[position])
+            for position, count in found.items()
+            if data.totals[position] - count <= max_missing
+        )
+        return [(-recipe_id, missing) for missing, recipe_id in matches]
+
+
+class TagSlugIndex(LazyIndex):
+    """
+    Соответствие slug тэга его id.
+    """
+    generation_key = TAGS_GENERATION_KEY
+
+    def build(self):
+        return dict(Tag.objects.values_list('slug', 'id'))
+
+
+ingredient_index = IngredientPrefixIndex()
+pantry_index = PantryIndex()
+tag_index = TagSlugIndex()
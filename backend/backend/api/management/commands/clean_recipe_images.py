@@ -0,0 +1,70 @@
+import json
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.utils import timezone
+from foodgram.models import Recipe
+
+
+def walk(directory):
+    directories, files = default_storage.listdir(directory)
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for child in directories:
+        yield from walk(posixpath.join(directory, child))
+
+
+class Command(BaseCommand):
+    help = 'Deletes recipe image files that no recipe references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int,
+            default=settings.RECIPE_IMAGE_UPLOAD_TOKEN_MAX_AGE,
+            help='Keep files modified less than this many seconds ago'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only list files that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        directory = Recipe._meta.get_field('image').upload_to.rstrip('/')
+        if not default_storage.exists(directory):
+            return
+        referenced = self.referenced()
+        # Свежие файлы без ссылок могут быть загрузками по токену,
+        # ещё не привязанными к рецепту.
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        deleted = 0
+        for name in walk(directory):
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name) > threshold:
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Unreferenced recipe images: {deleted}'
+        ))
+
+    def referenced(self):
+        """
+        Имена картинок и уменьшенных копий, на которые ссылаются рецепты.
+        """
+        names = set()
+        recipes = Recipe.objects.values_list('image', 'image_renditions')
+        for image, renditions in recipes.iterator():
+            names.add(image)
+            if not renditions:
+                continue
+            for files in json.loads(renditions).values():
+                if isinstance(files, dict):
+                    names.update(files.values())
+        return names
@@ -0,0 +1,37 @@
+import gzip
+import sys
+
+from api.catalogue import dump
+from django.core.management import BaseCommand
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports users, tags, ingredients, recipes, favorites, shopping '
+        'lists and subscriptions as NDJSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Output file, .gz is compressed, - for stdout'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        file = open_output(options['path'])
+        try:
+            counts = dump(file, options['batch_size'])
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(', '.join(
+            f'{kind}: {count}' for kind, count in counts.items()
+        ))
@@ -0,0 +1,50 @@
+import gzip
+import sys
+
+from api.catalogue import CatalogueLoader
+from django.core.management import BaseCommand, CommandError, call_command
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports a catalogue exported by export_catalogue, '
+        'skipping records that already exist'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, .gz or - for stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        loader = CatalogueLoader(options['batch_size'], self.progress)
+        file = open_input(options['path'])
+        try:
+            created = loader.load(file)
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Invalid catalogue record: {error}')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        if any(created.values()):
+            # bulk_create не обновляет счётчики.
+            call_command(
+                'recount_counters',
+                batch_size=options['batch_size'],
+                stdout=self.stdout
+            )
+        if loader.skipped:
+            self.stderr.write(
+                f'Records without matching references: {loader.skipped}'
+            )
+        self.stdout.write(self.style.SUCCESS('Catalogue imported'))
+
+    def progress(self, kind, created):
+        self.stdout.write(f'{kind}: {created}')
@@ -0,0 +1,26 @@
+from api.images import load_renditions, process_recipe_image
+from django.core.management import BaseCommand
+from foodgram.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generates missing or outdated recipe image renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate renditions for every recipe'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_renditions'
+        ).order_by('id')
+        for recipe in recipes.iterator():
+            if options['all'] or load_renditions(recipe) is None:
+                process_recipe_image(recipe.id, recipe.image.name)
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipe images processed: {processed}'
+        ))
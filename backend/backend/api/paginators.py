@@ -1,5 +1,207 @@
-from rest_framework.pagination import PageNumberPagination
-
-
-class PageLimitPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from .cache import (RECIPES_GENERATION_KEY, USER_GENERATION_KEY,
+                    get_generation, make_key)
+
+
+class PageLimitPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по убыванию id.
+    Стоимость страницы не зависит от её глубины и не требует COUNT(*).
+    """
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+
+class FeedCursorPagination(IdCursorPagination):
+    ordering = '-recipe_id'
+
+
+class PageLimitOrCursorPagination(PageLimitPagination):
+    """
+    Постраничная пагинация с переключением на курсорную.
+    Курсорный режим включается параметром pagination=cursor,
+    ссылки next/previous в этом режиме содержат параметр cursor.
+    Клиенты, использующие page и limit, работают как раньше.
+    Курсор всегда упорядочивает по id, поэтому параметры из
+    ordered_query_params, задающие свой порядок, с ним несовместимы.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_pagination_class = IdCursorPagination
+    cursor_paginator = None
+    ordered_query_params = ()
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def check_cursor_params(self, request):
+        params = [
+            param for param in self.ordered_query_params
+            if request.query_params.get(param, '').strip()
+        ]
+        if params:
+            raise ValidationError({'errors': [
+                'Курсорная пагинация несовместима с параметрами: '
+                + ', '.join(params) + '.'
+            ]})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.check_cursor_params(request)
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, который берёт количество объектов из кэша.
+    Для таблиц без фильтров на PostgreSQL вместо COUNT(*)
+    используется оценка планировщика из pg_class. Оценка
+    показывается в count, но последние страницы проверяются
+    по точному количеству.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.is_estimate = False
+
+    @cached_property
+    def count(self):
+        cached = cache.get(self.cache_key)
+        if cached is not None:
+            self.is_estimate = cached[1]
+            return cached[0]
+        count = self.estimate_count()
+        if count is None:
+            return self.exact_count()
+        self.is_estimate = True
+        cache.set(
+            self.cache_key,
+            (count, True),
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+    def exact_count(self):
+        count = Paginator.count.func(self)
+        self.is_estimate = False
+        cache.set(
+            self.cache_key,
+            (count, False),
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+    def validate_number(self, number):
+        """
+        Оценка планировщика может быть меньше настоящего количества.
+        На последней по оценке странице и дальше количество
+        пересчитывается точно, чтобы последние страницы не терялись,
+        а ссылка next не обрывалась раньше времени.
+        """
+        try:
+            number = super().validate_number(number)
+        except EmptyPage:
+            if not self.is_estimate:
+                raise
+            self.refresh_count()
+            return super().validate_number(number)
+        if number >= self.num_pages and self.is_estimate:
+            self.refresh_count()
+            return super().validate_number(number)
+        return number
+
+    def refresh_count(self):
+        self.__dict__['count'] = self.exact_count()
+        self.__dict__.pop('num_pages', None)
+
+    def estimate_count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql' or query.where or query.distinct:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.PAGINATION_COUNT_ESTIMATE_MIN:
+            return None
+        return row[0]
+
+
+class CachedCountPagination(PageLimitOrCursorPagination):
+    """
+    Пагинация с кэшированием общего количества объектов.
+    Ключ кэша строится по нормализованным параметрам фильтрации
+    и поколению данных, которое меняется при записи.
+    Для фильтров, зависящих от пользователя, в ключ входят
+    id пользователя и поколение его избранного и списка покупок.
+    """
+    generation_key = RECIPES_GENERATION_KEY
+    ignored_query_params = (
+        'page', 'limit', 'cursor', 'pagination', 'format', 'ordering'
+    )
+    user_query_params = ('is_favorited', 'is_in_shopping_cart')
+    ordered_query_params = ('name', 'search', 'ordering')
+
+    def get_count_cache_key(self, queryset, request):
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+            if key not in self.ignored_query_params
+        )
+        parts = [
+            queryset.model._meta.label,
+            get_generation(self.generation_key),
+            params,
+        ]
+        user = request.user
+        if user.is_authenticated and any(
+            key in self.user_query_params for key, values in params
+        ):
+            parts.extend((
+                user.id,
+                get_generation(USER_GENERATION_KEY.format(user.id)),
+            ))
+        return make_key('page-count', *parts)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            cache_key=self.get_count_cache_key(queryset, request)
+        )
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,145 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+PDF_FONT = 'ShoppingListFont'
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def format_row(row):
+    return (
+        f'{row["ingredient__name"]} - {row["amount"]} '
+        f'{row["ingredient__measurement_unit"]}'
+    )
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: возвращает записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+    Метод stream отдаёт файл по частям из итератора строк,
+    render используется только для сообщений об ошибках.
+    """
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode('utf-8')
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class PlainTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, rows):
+        separator = ''
+        for row in rows:
+            yield f'{separator}{format_row(row)}'.encode(self.charset)
+            separator = '\n'
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        # BOM нужен, чтобы Excel распознал кодировку.
+        yield '\ufeff'.encode(self.charset)
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        ).encode(self.charset)
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['amount'],
+                row['ingredient__measurement_unit'],
+            )).encode(self.charset)
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    """
+    Рендерер списка покупок для печати.
+    PDF собирается постранично и отдаётся частями после сборки:
+    формат требует таблицу смещений в конце файла.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def get_font(self):
+        if PDF_FONT in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT
+        if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT, settings.SHOPPING_LIST_PDF_FONT)
+            )
+            return PDF_FONT
+        return 'Helvetica'
+
+    def stream(self, rows):
+        buffer = BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        font = self.get_font()
+        top = A4[1] - self.margin
+        document.setFont(font, self.font_size + 4)
+        document.drawString(self.margin, top, 'Список покупок')
+        position = top - self.line_height * 2
+        for row in rows:
+            if position < self.margin:
+                document.showPage()
+                position = top
+            document.setFont(font, self.font_size)
+            document.drawString(self.margin, position, format_row(row))
+            position -= self.line_height
+        document.save()
+        buffer.seek(0)
+        for chunk in iter(lambda: buffer.read(PDF_CHUNK_SIZE), b''):
+            yield chunk
+
+
+class DefaultRendererNegotiation(DefaultContentNegotiation):
+    """
+    Если заголовок Accept не подходит ни одному рендереру,
+    используется первый из них, как было до поддержки форматов.
+    Явно запрошенный через ?format= формат проверяется как обычно.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format_query_param = self.settings.URL_FORMAT_OVERRIDE
+            if format_suffix or request.query_params.get(format_query_param):
+                raise
+            return renderers[0], renderers[0].media_type
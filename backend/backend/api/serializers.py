@@ -1,12 +1,37 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from drf_extra_fields.fields import Base64ImageField
 from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                             ShoppingList, Subscription, Tag)
+                             ShoppingList, ShoppingListIngredient,
+                             SimilarityBucket, Tag)
 from rest_framework import serializers
 from rest_framework.fields import CurrentUserDefault
 from users.models import User
 from users.serializers import CustomUserSerializer
 
+from .cache import record_recipe_ingredients_changes
+from .images import rendition_urls
+from .uploads import load_upload
+
+
+def ingredient_ids(ingredients):
+    return {ingredient['ingredient']['id'] for ingredient in ingredients}
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Принимает картинку в base64 или токен,
+    полученный при загрузке файла на /api/recipes/images/.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and ';base64,' not in data:
+            name = load_upload(data, self.context['request'].user)
+            if name is not None:
+                return name
+        return super().to_internal_value(data)
+
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """
@@ -77,7 +102,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         source='recipeingredient',
         required=True
     )
-    image = Base64ImageField(use_url=True, required=True)
+    image = RecipeImageField(use_url=True, required=True)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -90,20 +116,30 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time'
         )
 
     def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
         data = super(RecipeSerializer, self).to_representation(instance)
         data['tags'] = TagSerializer(instance.tags.all(), many=True).data
-        data['ingredients'] = RecipeIngredientSerializer(
-            instance.recipeingredient.all(),
-            many=True
-        ).data
         return data
 
+    def with_related(self, instance):
+        """
+        Перечитывает сохранённый рецепт вместе со связанными объектами,
+        чтобы ответ собирался без запроса на каждый ингредиент.
+        """
+        return Recipe.objects.with_user_flags(
+            self.context['request'].user
+        ).with_related().get(pk=instance.pk)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -113,6 +149,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -121,6 +159,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             user=request.user
         ).exists()
 
+    def get_images(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
     def validate_cooking_time(self, value):
         cooking_time = value
         if int(cooking_time) <= 0:
@@ -134,16 +175,18 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Необходимо добавить хотя бы 1 игредиент'
             )
-        ingredient_list = []
+        ingredient_ids = [
+            ingredient_item['ingredient'].get('id')
+            for ingredient_item in value
+        ]
+        if len(Ingredient.objects.in_bulk(ingredient_ids)) != len(
+            set(ingredient_ids)
+        ):
+            raise Http404
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise serializers.ValidationError('Ингридиенты должны '
+                                              'быть уникальными')
         for ingredient_item in value:
-            ingredient_id = ingredient_item['ingredient'].get('id')
-            ingredient = get_object_or_404(Ingredient,
-                                           id=ingredient_id)
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError('Ингридиенты должны '
-                                                  'быть уникальными')
-            ingredient_list.append(ingredient)
-
             amount = ingredient_item.get('amount')
             if int(amount) <= 0:
                 raise serializers.ValidationError('Проверьте, что количество'
@@ -165,14 +208,13 @@ class RecipeSerializer(serializers.ModelSerializer):
     def ingredients_creation(self, ingredients, recipe):
         RecipeIngredient.objects.bulk_create(
             [RecipeIngredient(
-                ingredient=Ingredient.objects.get(
-                    id=ingredient['ingredient']['id']
-                ),
+                ingredient_id=ingredient['ingredient']['id'],
                 recipe=recipe,
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients_data = validated_data.pop('recipeingredient')
@@ -180,45 +222,117 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags_data)
         self.ingredients_creation(ingredients_data, recipe)
-        return recipe
-
+        SimilarityBucket.objects.assign(
+            {recipe.id: ingredient_ids(ingredients_data)}, replace=False
+        )
+        record_recipe_ingredients_changes([recipe.id])
+        return self.with_related(recipe)
+
+    def ingredients_update(self, ingredients, recipe):
+        """
+        Приводит ингредиенты рецепта к новому списку.
+        Затрагиваются только изменившиеся строки: удалённые, новые
+        и с другим количеством. Возвращает разницу количеств
+        по ингредиентам.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipeingredient.all()
+        }
+        amounts = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        deltas = {
+            ingredient_id: -item.amount
+            for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        }
+        if deltas:
+            RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=deltas
+            ).delete()
+        created, updated = [], []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                created.append(RecipeIngredient(
+                    ingredient_id=ingredient_id,
+                    recipe=recipe,
+                    amount=amount
+                ))
+                deltas[ingredient_id] = amount
+            elif item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                updated.append(item)
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        if updated:
+            RecipeIngredient.objects.bulk_update(updated, ['amount'])
+        return deltas
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        instance.tags.clear()
-        RecipeIngredient.objects.filter(recipe=instance).all().delete()
-        tags_data = validated_data.pop('tags')
-        instance.tags.set(tags_data)
+        items = ShoppingListIngredient.objects
+        # Пока рецепт заблокирован, его нельзя добавить в список покупок,
+        # поэтому все пользователи со старым составом попадут в user_ids.
+        items.lock_recipes([instance.id])
+        user_ids = list(instance.shoppinglist.values_list('user', flat=True))
+        if user_ids:
+            items.lock_users(user_ids)
+        instance.tags.set(validated_data.pop('tags'))
         ingredients = validated_data.pop('recipeingredient')
-        self.ingredients_creation(ingredients, instance)
-        return super().update(instance, validated_data)
+        deltas = self.ingredients_update(ingredients, instance)
+        items.change(user_ids, deltas)
+        if deltas:
+            SimilarityBucket.objects.assign(
+                {instance.id: ingredient_ids(ingredients)}
+            )
+            record_recipe_ingredients_changes([instance.id])
+        return self.with_related(super().update(instance, validated_data))
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
     """
     Сериализатор для избранных рецептов.
     """
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'images', 'cooking_time',)
 
-    def validate(self, data):
-        request = self.context.get('request')
-        current_user = request.user
-        recipe_in_favorite = Favorite.objects.filter(
-            user=current_user,
-            recipe=self.initial_data['recipe']
-        )
-        if request.method == 'POST':
-            if recipe_in_favorite.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Этот рецепт уже есть в избранном.'
-                })
-        if request.method == 'DELETE':
-            if not recipe_in_favorite.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Этого рецепта нет в избранном пользователя.'
-                })
-        return data
+    def get_images(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор для списка id рецептов в массовых операциях.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_MAX_IDS
+    )
+
+
+class PantrySerializer(serializers.Serializer):
+    """
+    Сериализатор для параметров подбора рецептов по продуктам.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PANTRY_MAX_INGREDIENTS
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0,
+        max_value=settings.PANTRY_MAX_MISSING,
+        default=settings.PANTRY_MAX_MISSING
+    )
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
@@ -226,6 +340,7 @@ class ShoppingListSerializer(serializers.ModelSerializer):
     Сериализатор для списка покупок.
     """
     image = Base64ImageField(use_url=True, required=True)
+    images = serializers.SerializerMethodField()
     id = serializers.PrimaryKeyRelatedField(read_only=True)
     name = serializers.StringRelatedField()
     cooking_time = serializers.IntegerField()
@@ -235,29 +350,13 @@ class ShoppingListSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time'
         )
         model = ShoppingList
 
-    def validate(self, data):
-        request = self.context.get('request')
-        current_user = request.user
-        recipe_in_shopping_list = ShoppingList.objects.filter(
-            user=current_user,
-            recipe=self.initial_data['recipe']
-        )
-        if request.method == 'POST':
-            if recipe_in_shopping_list.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Этот рецепт уже есть в списке покупок.'
-                })
-        if request.method == 'DELETE':
-            if not recipe_in_shopping_list.exists():
-                raise serializers.ValidationError({
-                    'errors':
-                    'Этого рецепта нет в списке покупок пользователя.'
-                })
-        return data
+    def get_images(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
 
 
 class UserSubscriptionSerializer(CustomUserSerializer):
@@ -284,37 +383,15 @@ class UserSubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipes
-        if limit:
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        elif limit:
             recipes = recipes.all()[:int(limit)]
         context = {'request': request}
         return ShoppingListSerializer(recipes, context=context, many=True).data
-
-    def validate(self, data):
-        request = self.context.get('request')
-        current_user = request.user
-        author = self.initial_data['author']
-        in_subscribed = Subscription.objects.filter(
-            user=current_user,
-            author=author
-        )
-        if request.method == 'POST':
-            if in_subscribed.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Вы уже подписаны на этого автора.'
-                })
-            if author == current_user:
-                raise serializers.ValidationError({
-                    'errors': 'Нельзя подписаться на себя.'
-                })
-        if request.method == 'DELETE':
-            if not in_subscribed.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Вы не подписаны на этого автора.'
-                })
-        return data
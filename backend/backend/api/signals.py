@@ -0,0 +1,113 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingList,
+                             ShoppingListIngredient, Tag, change_counter)
+from foodgram.signals import ingredients_loaded
+from users.models import User
+
+from .cache import (INGREDIENTS_GENERATION_KEY, RECIPES_GENERATION_KEY,
+                    TAGS_GENERATION_KEY, USER_GENERATION_KEY, bump_generation,
+                    bump_generation_on_commit, invalidate_recipes,
+                    record_recipe_ingredients_changes)
+from .images import load_renditions, schedule_renditions
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    bump_generation(RECIPES_GENERATION_KEY)
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(instance, **kwargs):
+    if instance.image and load_renditions(instance) is None:
+        schedule_renditions(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    """
+    Вычитает ингредиенты удаляемого рецепта из списков покупок.
+    Строки списка покупок удаляются каскадом позже,
+    поэтому состав рецепта ещё доступен.
+    """
+    user_ids = list(instance.shoppinglist.values_list('user', flat=True))
+    if user_ids:
+        items = ShoppingListIngredient.objects
+        items.lock_users(user_ids)
+        items.remove_recipes(user_ids, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_') and action != 'pre_clear':
+        return
+    bump_generation(RECIPES_GENERATION_KEY)
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    elif pk_set is not None:
+        invalidate_recipes(pk_set)
+    elif action == 'pre_clear':
+        invalidate_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+    record_recipe_ingredients_changes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(instance, **kwargs):
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
+    bump_generation_on_commit(TAGS_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(instance, **kwargs):
+    bump_generation_on_commit(INGREDIENTS_GENERATION_KEY)
+    invalidate_recipes(
+        instance.recipeingredient.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(ingredients_loaded)
+def ingredients_bulk_loaded(**kwargs):
+    bump_generation(INGREDIENTS_GENERATION_KEY)
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields=None, **kwargs):
+    if update_fields == frozenset(['last_login']):
+        return
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def user_recipes_changed(instance, **kwargs):
+    bump_generation(USER_GENERATION_KEY.format(instance.user_id))
@@ -0,0 +1,93 @@
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+UPLOADS_DIR = 'recipes'
+UPLOAD_TOKEN_SALT = 'api.uploads.recipe-image'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет файл во временный файл на диске частями.
+    Загрузка прерывается, как только файл превысил допустимый размер,
+    поэтому в памяти не держится больше одного блока.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.received = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def inspect_image(file):
+    """
+    Определяет формат и размеры картинки по заголовку файла.
+    Пиксели при этом не декодируются.
+    """
+    try:
+        image = Image.open(file)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError({'errors': ['Файл не является картинкой']})
+    if image.format not in settings.RECIPE_IMAGE_UPLOAD_FORMATS:
+        raise ValidationError({'errors': [
+            f'Формат {image.format} не поддерживается'
+        ]})
+    width, height = image.size
+    if max(width, height) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+        raise ValidationError({'errors': [
+            'Сторона картинки не может быть больше '
+            f'{settings.RECIPE_IMAGE_MAX_DIMENSION} пикселей'
+        ]})
+    return image.format, width, height
+
+
+def save_upload(file, image_format, user):
+    """
+    Сохраняет загруженную картинку и возвращает подписанный токен,
+    по которому её можно указать при создании рецепта.
+    """
+    file.seek(0)
+    extension = settings.RECIPE_IMAGE_UPLOAD_FORMATS[image_format]
+    # Временный файл перемещается в хранилище, а не копируется.
+    # Такая же картинка, загруженная раньше, повторно не сохраняется.
+    name = default_storage.save(
+        f'{UPLOADS_DIR}/{uuid.uuid4().hex}.{extension}', file
+    )
+    file.close()
+    return signing.dumps(
+        {'name': name, 'user': user.pk}, salt=UPLOAD_TOKEN_SALT
+    )
+
+
+def load_upload(token, user):
+    """
+    Возвращает имя загруженной картинки по токену.
+    Чужой, просроченный или поддельный токен даёт None.
+    """
+    try:
+        data = signing.loads(
+            token,
+            salt=UPLOAD_TOKEN_SALT,
+            max_age=settings.RECIPE_IMAGE_UPLOAD_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    if data.get('user') != user.pk:
+        return None
+    if not default_storage.exists(data['name']):
+        return None
+    return data['name']
@@ -12,9 +12,10 @@ router.register(r'ingredients', IngredientViewSet)
 router.register(r'users', UserViewSet)
 
 urlpatterns = [
-    path('users/subscriptions/', UserViewSet.as_view({
-        'get': 'subscriptions',
-    })),
+    path('users/subscriptions/', UserViewSet.as_view(
+        {'get': 'subscriptions'},
+        **UserViewSet.subscriptions.kwargs
+    )),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
     path('', include(router.urls)),
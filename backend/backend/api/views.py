@@ -1,17 +1,96 @@
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
-from foodgram.models import Subscription
-from rest_framework import permissions, status, viewsets
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
+from foodgram.models import (FeedEntry, ShoppingListIngredient,
+                             SimilarityBucket, Subscription, change_counter)
+from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FileUploadParser, MultiPartParser
 from rest_framework.response import Response
 
+from .cache import (RECIPE_DETAIL_KEY, USER_GENERATION_KEY, bump_generation,
+                    make_key)
 from .filters import IngredientFilter, RecipeFilter
+from .images import absolute_urls
+from .indexes import ingredient_index, pantry_index
+from .paginators import (CachedCountPagination, FeedCursorPagination,
+                         PageLimitOrCursorPagination, PageLimitPagination)
 from .permissions import IsAuthorOrAdminOrReadOnly
+from .renderers import (CSVRenderer, DefaultRendererNegotiation, PDFRenderer,
+                        PlainTextRenderer)
 from .serializers import (Favorite, FavoriteSerializer, Ingredient,
-                          IngredientSerializer, Recipe, RecipeIngredient,
-                          RecipeSerializer, ShoppingList,
+                          IngredientSerializer, PantrySerializer, Recipe,
+                          RecipeIdsSerializer, RecipeSerializer, ShoppingList,
                           ShoppingListSerializer, Tag, TagSerializer, User,
                           UserSubscriptionSerializer)
+from .uploads import LimitedUploadHandler, inspect_image, save_upload
+
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'author_is_subscribed')
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingList: 'shopping_count',
+}
+
+
+def create_relation(model, message, user, **target):
+    """
+    Создаёт связь пользователя с объектом одним запросом
+    INSERT ... SELECT ... WHERE EXISTS ... ON CONFLICT DO NOTHING.
+    Повторное добавление отсекает ограничение уникальности,
+    отсутствующий объект - условие EXISTS. Только если строка
+    не добавилась, отдельный запрос выясняет причину: 404 или 400.
+    Сигналы post_save при этом не отправляются.
+    """
+    (name, target_id), = target.items()
+    field = model._meta.get_field(name)
+    related = field.related_model._meta
+    try:
+        target_id = related.pk.to_python(target_id)
+    except DjangoValidationError:
+        raise Http404
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    qn = ops.quote_name
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{qn(model._meta.db_table)} '
+        f'({qn(model._meta.get_field("user").column)}, {qn(field.column)}) '
+        f'SELECT %s, %s WHERE EXISTS (SELECT 1 FROM {qn(related.db_table)} '
+        f'WHERE {qn(related.pk.column)} = %s) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    returning = connection.features.can_return_id_from_insert
+    if returning:
+        sql += f' RETURNING {qn(model._meta.pk.column)}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (user.id, target_id, target_id))
+        created = (
+            cursor.fetchone() is not None if returning
+            else cursor.rowcount == 1
+        )
+    if not created:
+        get_object_or_404(field.related_model, pk=target_id)
+        raise ValidationError({'errors': [message]})
+
+
+def delete_relation(model, message, parent_model, parent_pk, **fields):
+    """
+    Удаляет связь без предварительной проверки её наличия.
+    Существование объекта проверяется, только если удалять было нечего.
+    """
+    deleted, _ = model.objects.filter(**fields).delete()
+    if not deleted:
+        get_object_or_404(parent_model, pk=parent_pk)
+        raise ValidationError({'errors': [message]})
 
 
 class TagViewSet(viewsets.ModelViewSet):
@@ -35,6 +114,18 @@ class IngredientViewSet(viewsets.ModelViewSet):
         'name'
     )
 
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск по началу названия обслуживается индексом в памяти процесса
+        без обращения к базе данных.
+        """
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_INDEX_ENABLED:
+            return Response(ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """
@@ -45,7 +136,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrAdminOrReadOnly, ]
+    pagination_class = CachedCountPagination
     filterset_class = RecipeFilter
+    lookup_value_regex = '[0-9]+'
     filterset_fields = (
         'tags',
         'author',
@@ -53,33 +146,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
         'is_in_shopping_cart'
     )
 
+    def get_queryset(self):
+        return Recipe.objects.with_user_flags(
+            self.request.user
+        ).with_related()
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Общая для всех пользователей часть рецепта берётся из кэша,
+        флаги текущего пользователя запрашиваются отдельно.
+        Ключ строится по числовому id, чтобы /recipes/01/ не создавал
+        отдельную запись, которую не удалит invalidate_recipes.
+        """
+        key = RECIPE_DETAIL_KEY.format(int(kwargs['pk']))
+        data = cache.get(key)
+        if data is None:
+            instance = self.get_object()
+            data = RecipeSerializer(instance).data
+            flags = {
+                flag: getattr(instance, flag) for flag in USER_FLAGS
+            }
+            data['is_favorited'] = False
+            data['is_in_shopping_cart'] = False
+            data['author']['is_subscribed'] = False
+            cache.set(key, data, settings.RECIPE_DETAIL_CACHE_TIMEOUT)
+        else:
+            flags = self.get_user_flags(kwargs['pk'])
+        data['image'] = request.build_absolute_uri(data['image'])
+        data['images'] = absolute_urls(data['images'], request)
+        data['is_favorited'] = flags['is_favorited']
+        data['is_in_shopping_cart'] = flags['is_in_shopping_cart']
+        data['author']['is_subscribed'] = flags['author_is_subscribed']
+        return Response(data)
+
+    def get_user_flags(self, pk):
+        if self.request.user.is_anonymous:
+            return dict.fromkeys(USER_FLAGS, False)
+        flags = Recipe.objects.filter(pk=pk).with_user_flags(
+            self.request.user
+        ).values(*USER_FLAGS).first()
+        if flags is None:
+            raise Http404
+        return flags
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
         url_path='favorite',
         permission_classes=(permissions.IsAuthenticated,))
     def favorite(self, request, pk):
-        current_user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        recipe_in_favorite = Favorite.objects.filter(
-            user=current_user,
-            recipe=recipe
-        )
-        data = {'user': current_user, 'recipe': recipe}
-        serializer = FavoriteSerializer(
-            data=data,
-            context={'request': request},
-            partial=True
-        )
-        serializer.is_valid(raise_exception=True)
+        # Блокировка пользователя, как в bulk_relation, не даёт
+        # одиночному и массовому запросам дважды учесть один рецепт.
+        items = ShoppingListIngredient.objects
         if request.method == 'POST':
-            Favorite.objects.create(user=current_user, recipe=recipe)
+            with transaction.atomic():
+                items.lock_users([request.user.id])
+                create_relation(
+                    Favorite,
+                    'Этот рецепт уже есть в избранном.',
+                    user=request.user,
+                    recipe=pk
+                )
+                change_counter(
+                    Recipe.objects.filter(pk=pk), 'favorites_count', 1
+                )
+            bump_generation(USER_GENERATION_KEY.format(request.user.id))
             serializer = FavoriteSerializer(
-                recipe,
+                get_object_or_404(Recipe, pk=pk),
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        recipe_in_favorite.delete()
+        with transaction.atomic():
+            items.lock_users([request.user.id])
+            delete_relation(
+                Favorite,
+                'Этого рецепта нет в избранном пользователя.',
+                Recipe,
+                pk,
+                user=request.user,
+                recipe_id=pk
+            )
+            change_counter(
+                Recipe.objects.filter(pk=pk), 'favorites_count', -1
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -89,46 +238,311 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        current_user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        in_shopping_cart = ShoppingList.objects.filter(
-            user=current_user, recipe=recipe)
-        data = {'user': current_user, 'recipe': recipe}
-        serializer = ShoppingListSerializer(
-            data=data,
-            context={'request': request},
-            partial=True
-        )
-        serializer.is_valid(raise_exception=True)
+        items = ShoppingListIngredient.objects
         if request.method == 'POST':
-            ShoppingList.objects.create(user=current_user, recipe=recipe)
+            with transaction.atomic():
+                # Блокировка рецепта, см. lock_recipes.
+                recipe = get_object_or_404(
+                    Recipe.objects.select_for_update(), pk=pk
+                )
+                items.lock_users([request.user.id])
+                create_relation(
+                    ShoppingList,
+                    'Этот рецепт уже есть в списке покупок.',
+                    user=request.user,
+                    recipe=recipe.id
+                )
+                items.add_recipes([request.user.id], [recipe.id])
+                change_counter(
+                    Recipe.objects.filter(pk=pk), 'shopping_count', 1
+                )
+            bump_generation(USER_GENERATION_KEY.format(request.user.id))
             serializer = ShoppingListSerializer(
                 recipe,
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        in_shopping_cart.delete()
+        with transaction.atomic():
+            items.lock_recipes([pk])
+            items.lock_users([request.user.id])
+            delete_relation(
+                ShoppingList,
+                'Этого рецепта нет в списке покупок пользователя.',
+                Recipe,
+                pk,
+                user=request.user,
+                recipe_id=pk
+            )
+            items.remove_recipes([request.user.id], [pk])
+            change_counter(
+                Recipe.objects.filter(pk=pk), 'shopping_count', -1
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_relation(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_relation(request, ShoppingList)
+
+    def bulk_relation(self, request, model):
+        """
+        Добавляет или удаляет сразу несколько рецептов.
+        Все id проверяются одним запросом, изменения вносятся
+        одним INSERT или DELETE. Для каждого id возвращается результат.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        items = ShoppingListIngredient.objects
+        is_cart = model is ShoppingList
+        with transaction.atomic():
+            # Блокировка пользователя не даёт параллельным запросам
+            # дважды учесть один рецепт в счётчиках и суммах.
+            if is_cart:
+                items.lock_recipes(ids)
+            items.lock_users([request.user.id])
+            found = dict(Recipe.objects.filter(id__in=ids).annotate(
+                related=Exists(model.objects.filter(
+                    user=request.user,
+                    recipe=OuterRef('pk')
+                ))
+            ).values_list('id', 'related'))
+            if request.method == 'POST':
+                changed = [pk for pk in ids if pk in found and not found[pk]]
+                model.objects.bulk_create(
+                    [model(user=request.user, recipe_id=pk) for pk in changed],
+                    ignore_conflicts=True
+                )
+                outcomes = {True: 'exists', False: 'added'}
+                delta = 1
+                if is_cart:
+                    items.add_recipes([request.user.id], changed)
+            else:
+                changed = [pk for pk in ids if found.get(pk)]
+                model.objects.filter(
+                    user=request.user,
+                    recipe_id__in=changed
+                ).delete()
+                outcomes = {True: 'removed', False: 'missing'}
+                delta = -1
+                if is_cart:
+                    items.remove_recipes([request.user.id], changed)
+            change_counter(
+                Recipe.objects.filter(id__in=changed),
+                RECIPE_COUNTERS[model],
+                delta
+            )
+        if changed:
+            bump_generation(USER_GENERATION_KEY.format(request.user.id))
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    outcomes[found[pk]] if pk in found else 'not_found'
+                ),
+            }
+            for pk in ids
+        ]})
+
     @action(
         detail=False,
         methods=['GET'],
-        url_path='download_shopping_cart',
         permission_classes=(permissions.IsAuthenticated,)
     )
+    def feed(self, request):
+        """
+        Рецепты авторов из подписок, новые первыми.
+        Страница ленты читается проходом по индексу записей ленты,
+        затем рецепты страницы загружаются одним запросом.
+        """
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.timeline(request.user),
+            request,
+            view=self
+        )
+        recipe_ids = [entry['recipe_id'] for entry in entries]
+        recipes = Recipe.objects.with_user_flags(
+            request.user
+        ).with_related().in_bulk(recipe_ids)
+        serializer = RecipeSerializer(
+            [
+                recipes[recipe_id] for recipe_id in recipe_ids
+                if recipe_id in recipes
+            ],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk):
+        """
+        Рецепты с самым похожим составом ингредиентов.
+        Кандидаты берутся из общих корзин LSH, поэтому рецепт
+        не сравнивается со всем каталогом. У каждого рецепта
+        в similarity указан коэффициент Жаккара.
+        """
+        limit = serializers.IntegerField(
+            min_value=1,
+            max_value=settings.SIMILAR_RECIPES_MAX_LIMIT
+        ).run_validation(request.query_params.get(
+            'limit', settings.SIMILAR_RECIPES_LIMIT
+        ))
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        similar = SimilarityBucket.objects.similar(recipe.id, limit)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _ in similar]
+        )
+        data = []
+        for recipe_id, similarity in similar:
+            if recipe_id not in recipes:
+                continue
+            item = FavoriteSerializer(
+                recipes[recipe_id],
+                context=self.get_serializer_context()
+            ).data
+            item['similarity'] = round(similarity, 3)
+            data.append(item)
+        return Response(data)
+
+    @action(detail=False, methods=['GET'])
+    def pantry(self, request):
+        """
+        Рецепты, которые можно приготовить из продуктов пользователя.
+        Продукты передаются параметрами ingredients, рецептам может
+        не хватать не больше max_missing ингредиентов.
+        Подбор выполняется по индексу в памяти, из базы читаются
+        только рецепты страницы. У каждого рецепта в missing_ingredients
+        перечислены id недостающих ингредиентов.
+        """
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        pantry = set(serializer.validated_data['ingredients'])
+        paginator = PageLimitPagination()
+        matches = paginator.paginate_queryset(
+            pantry_index.match(
+                pantry, serializer.validated_data['max_missing']
+            ),
+            request,
+            view=self
+        )
+        recipes = Recipe.objects.with_user_flags(
+            request.user
+        ).with_related().in_bulk([recipe_id for recipe_id, _ in matches])
+        data = RecipeSerializer(
+            [
+                recipes[recipe_id] for recipe_id, _ in matches
+                if recipe_id in recipes
+            ],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        for recipe in data:
+            recipe['missing_ingredients'] = [
+                ingredient['id'] for ingredient in recipe['ingredients']
+                if ingredient['id'] not in pantry
+            ]
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='images',
+        permission_classes=(permissions.IsAuthenticated,),
+        parser_classes=(MultiPartParser, FileUploadParser)
+    )
+    def upload_image(self, request):
+        """
+        Принимает картинку рецепта файлом вместо base64 в JSON.
+        Размер запроса проверяется по Content-Length до чтения тела,
+        файл пишется на диск частями, формат и размеры
+        определяются по заголовку. Возвращает токен для поля image.
+        """
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        too_large = Response(
+            {'errors': [f'Размер файла больше {max_size} байт']},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > max_size:
+            return too_large
+        handler = LimitedUploadHandler(request._request, max_size)
+        request._request.upload_handlers = [handler]
+        upload = request.FILES.get('image') or request.FILES.get('file')
+        if handler.exceeded:
+            return too_large
+        if upload is None:
+            raise ValidationError({'errors': ['Файл не передан']})
+        image_format, width, height = inspect_image(upload)
+        return Response({
+            'image': save_upload(upload, image_format, request.user),
+            'format': image_format,
+            'width': width,
+            'height': height,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='download_shopping_cart',
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, PDFRenderer),
+        content_negotiation_class=DefaultRendererNegotiation
+    )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppinglist__user=request.user)
-        ingrediants_values = ingredients.values(
+        """
+        Отдаёт список покупок в формате txt, csv или pdf.
+        Формат выбирается по заголовку Accept или параметру ?format=.
+        Суммы ингредиентов читаются из заранее посчитанной таблицы
+        одним запросом, файл передаётся клиенту по мере готовности.
+        ETag считается по самим строкам списка вместе с названиями
+        и единицами измерения, неизменившийся список возвращается
+        ответом 304.
+        """
+        renderer = request.accepted_renderer
+        rows = list(ShoppingListIngredient.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient_id',
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount')).order_by('ingredient__name')
-        shopping_cart = '\n'.join([
-            f'{ingredient["ingredient__name"]} - {ingredient["amount"]} '
-            f'{ingredient["ingredient__measurement_unit"]}'
-            for ingredient in ingrediants_values
-        ])
-        return HttpResponse(shopping_cart, content_type='text/plain')
+            'ingredient__measurement_unit',
+            'amount'
+        ).order_by('ingredient__name', 'ingredient_id'))
+        etag = quote_etag(make_key(
+            'shopping-cart', renderer.format, json.dumps(rows)
+        ))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            response = StreamingHttpResponse(
+                renderer.stream(iter(rows)),
+                content_type=content_type
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_list.{renderer.extension}"'
+            )
+        response['ETag'] = etag
+        return response
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -138,6 +552,7 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     serializer_class = UserSubscriptionSerializer
     queryset = User.objects.all()
+    pagination_class = PageLimitOrCursorPagination
 
     @action(
         detail=True,
@@ -145,25 +560,41 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def subscribe(self, request, pk):
-        current_user = self.request.user
-        author = get_object_or_404(User, pk=pk)
-        in_subscribed = Subscription.objects.filter(
-            user=current_user, author=author)
-        data = {'user': current_user, 'author': author}
-        serializer = UserSubscriptionSerializer(
-            data=data,
-            context={'request': request},
-            partial=True
-        )
-        serializer.is_valid(raise_exception=True)
         if request.method == 'POST':
-            Subscription.objects.create(user=current_user, author=author)
+            author = get_object_or_404(User, pk=pk)
+            if author == request.user:
+                raise ValidationError({
+                    'errors': ['Нельзя подписаться на себя.']
+                })
+            with transaction.atomic():
+                create_relation(
+                    Subscription,
+                    'Вы уже подписаны на этого автора.',
+                    user=request.user,
+                    author=author.id
+                )
+                change_counter(
+                    User.objects.filter(pk=pk), 'subscribers_count', 1
+                )
+                FeedEntry.objects.backfill(request.user.id, [author.id])
             serializer = UserSubscriptionSerializer(
                 author,
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        in_subscribed.delete()
+        with transaction.atomic():
+            delete_relation(
+                Subscription,
+                'Вы не подписаны на этого автора.',
+                User,
+                pk,
+                user=request.user,
+                author_id=pk
+            )
+            change_counter(
+                User.objects.filter(pk=pk), 'subscribers_count', -1
+            )
+            FeedEntry.objects.filter(user=request.user, author_id=pk).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -172,9 +603,24 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def subscriptions(self, request):
+        """
+        Подписки пользователя с последними рецептами авторов.
+        Рецепты всех авторов страницы загружаются одним запросом,
+        поэтому число запросов не зависит от размера страницы.
+        """
         current_user = self.request.user
         user_subscribtions = User.objects.filter(subscribed__user=current_user)
         subscriptions_paginated = self.paginate_queryset(user_subscribtions)
+        limit = request.query_params.get('recipes_limit')
+        recipes = Recipe.objects.latest_by_author(
+            [author.id for author in subscriptions_paginated],
+            int(limit) if limit else None
+        )
+        authors_recipes = defaultdict(list)
+        for recipe in recipes:
+            authors_recipes[recipe.author_id].append(recipe)
+        for author in subscriptions_paginated:
+            author.latest_recipes = authors_recipes[author.id]
         serializer = UserSubscriptionSerializer(
             subscriptions_paginated,
             many=True, context={'request': request}
@@ -116,6 +116,8 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentHashStorage'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
@@ -139,6 +141,95 @@ SWAGGER_SETTINGS = {
 
 AUTH_USER_MODEL = 'users.User'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=30)
+)
+PAGINATION_COUNT_ESTIMATE_MIN = 10000
+
+RECIPE_DETAIL_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_DETAIL_CACHE_TIMEOUT', default=300)
+)
+
+INGREDIENT_INDEX_ENABLED = os.getenv(
+    'INGREDIENT_INDEX_ENABLED', default='True'
+) == 'True'
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+# Индексы в памяти процесса сбрасываются по поколению в кэше.
+# С LocMemCache поколение не видно другим процессам, поэтому индекс
+# дополнительно перестраивается не реже, чем раз в столько секунд.
+IN_MEMORY_INDEX_MAX_AGE = int(
+    os.getenv('IN_MEMORY_INDEX_MAX_AGE', default=60)
+)
+
+BULK_RECIPES_MAX_IDS = 100
+
+INGREDIENTS_DATA = os.getenv(
+    'INGREDIENTS_DATA',
+    default=os.path.join(BASE_DIR, '..', '..', 'data', 'ingredients.csv')
+)
+
+PANTRY_MAX_INGREDIENTS = 200
+PANTRY_MAX_MISSING = 2
+# Индекс подбора по продуктам обновляется по изменённым рецептам.
+# Полная перестройка нужна, только если изменений больше
+# PANTRY_INDEX_MAX_CHANGES, их записи пропали из кэша или индекс
+# старше PANTRY_INDEX_MAX_AGE секунд.
+PANTRY_INDEX_MAX_AGE = int(os.getenv('PANTRY_INDEX_MAX_AGE', default=3600))
+PANTRY_INDEX_MAX_CHANGES = 1000
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (150, 150),
+    'card': (600, 400),
+    'detail': (1200, 800),
+}
+RECIPE_IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+RECIPE_IMAGE_ASYNC = os.getenv('RECIPE_IMAGE_ASYNC', default='True') == 'True'
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_DIMENSION = 8000
+RECIPE_IMAGE_UPLOAD_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+}
+RECIPE_IMAGE_UPLOAD_TOKEN_MAX_AGE = 24 * 60 * 60
+
+# После изменения параметров MinHash корзины нужно пересчитать
+# командой rebuild_similar_recipes.
+SIMILAR_RECIPES_PERMUTATIONS = 64
+SIMILAR_RECIPES_BANDS = 16
+SIMILAR_RECIPES_SEED = 1
+SIMILAR_RECIPES_CANDIDATES = 100
+SIMILAR_RECIPES_LIMIT = 10
+SIMILAR_RECIPES_MAX_LIMIT = 50
+
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv('FEED_FANOUT_MAX_SUBSCRIBERS', default=10000)
+)
+FEED_BACKFILL_SIZE = 50
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                             ShoppingList, Subscription, Tag)
+                             ShoppingList, ShoppingListIngredient,
+                             Subscription, Tag)
 
 
 @admin.register(Ingredient)
@@ -19,7 +20,14 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('count_favorites',)
 
     def count_favorites(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
+
+
+@admin.register(ShoppingListIngredient)
+class ShoppingListIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_filter = ('user',)
+    readonly_fields = ('user', 'ingredient', 'amount')
 
 
 admin.site.register(Tag)
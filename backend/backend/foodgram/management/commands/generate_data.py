@@ -0,0 +1,203 @@
+import random
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+from faker import Faker
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingList,
+                             ShoppingListIngredient, SimilarityBucket,
+                             Subscription, Tag)
+from foodgram.utils import batched
+from PIL import Image
+from users.models import User
+
+IMAGE_NAME = 'recipes/generated.png'
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates synthetic users, recipes, favorites, shopping lists '
+        'and subscriptions for benchmarks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=5000)
+        parser.add_argument('--shopping', type=int, default=2000)
+        parser.add_argument('--subscriptions', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--ingredients-csv', default=settings.INGREDIENTS_DATA
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+
+        ingredient_ids = self.get_ingredients(options['ingredients_csv'])
+        tag_ids = self.get_tags()
+        self.create_users(options['users'])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        self.create_recipes(
+            options['recipes'],
+            user_ids,
+            ingredient_ids,
+            tag_ids,
+            options['ingredients_per_recipe']
+        )
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        self.create_pairs(
+            Favorite, 'recipe_id', options['favorites'], user_ids, recipe_ids
+        )
+        self.create_pairs(
+            ShoppingList, 'recipe_id', options['shopping'],
+            user_ids, recipe_ids
+        )
+        # bulk_create не обновляет суммы списков покупок.
+        ShoppingListIngredient.objects.rebuild(batch_size=self.batch_size)
+        self.create_pairs(
+            Subscription, 'author_id', options['subscriptions'],
+            user_ids, user_ids
+        )
+        # Ленты подписок заполняются после создания подписок.
+        FeedEntry.objects.rebuild(batch_size=self.batch_size)
+        SimilarityBucket.objects.rebuild(batch_size=self.batch_size)
+        # Счётчики тоже не обновляются при bulk_create.
+        call_command(
+            'recount_counters',
+            batch_size=self.batch_size,
+            stdout=self.stdout
+        )
+        self.stdout.write(self.style.SUCCESS('Data generated'))
+
+    def bulk_create(self, model, objects, total=None, **kwargs):
+        created = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+            progress = f'{created}/{total}' if total else created
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {progress}'
+            )
+
+    def get_ingredients(self, path):
+        call_command(
+            'load_ingredients',
+            path,
+            batch_size=self.batch_size,
+            stdout=self.stdout
+        )
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def get_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, slug=slug, color=color)
+                for name, slug, color in DEFAULT_TAGS
+            )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def get_image(self):
+        content = BytesIO()
+        Image.new('RGB', (600, 400), '#E26C2D').save(content, 'PNG')
+        # Хранилище может сохранить файл под другим именем,
+        # например по хэшу содержимого, и не дублирует одинаковые файлы.
+        return default_storage.save(
+            IMAGE_NAME, ContentFile(content.getvalue())
+        )
+
+    def create_users(self, count):
+        # Хэширование пароля дорогое, поэтому у всех пользователей он общий.
+        password = make_password('password')
+        start = (User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0) + 1
+        self.bulk_create(User, (
+            User(
+                username=f'{self.fake.user_name()}_{number}',
+                email=f'user{number}@example.com',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(start, start + count)
+        ), count)
+
+    def create_recipes(self, count, user_ids, ingredient_ids, tag_ids,
+                       ingredients_per_recipe):
+        image = self.get_image()
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        self.bulk_create(Recipe, (
+            Recipe(
+                name=f'{self.fake.sentence(nb_words=3)[:-1]} #{number}',
+                author_id=self.random.choice(user_ids),
+                image=image,
+                text=self.fake.paragraph(nb_sentences=5),
+                cooking_time=self.random.randint(5, 180),
+            )
+            for number in range(last_id + 1, last_id + count + 1)
+        ), count)
+        # SQLite не возвращает id после bulk_create, поэтому
+        # новые рецепты определяются по возрастанию id.
+        new_ids = list(Recipe.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True))
+        ingredients_per_recipe = min(
+            ingredients_per_recipe, len(ingredient_ids)
+        )
+        self.bulk_create(RecipeIngredient, (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in new_ids
+            for ingredient_id in self.random.sample(
+                ingredient_ids, ingredients_per_recipe
+            )
+        ), count * ingredients_per_recipe)
+        through = Recipe.tags.through
+        self.bulk_create(through, (
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in new_ids
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(1, len(tag_ids))
+            )
+        ))
+
+    def create_pairs(self, model, target_field, count, user_ids, target_ids):
+        if not user_ids or not target_ids:
+            return
+        if target_field == 'author_id':
+            count = min(count, len(user_ids) * (len(user_ids) - 1))
+        else:
+            count = min(count, len(user_ids) * len(target_ids))
+        seen = set()
+
+        def pairs():
+            while len(seen) < count:
+                user_id = self.random.choice(user_ids)
+                target_id = self.random.choice(target_ids)
+                if target_field == 'author_id' and user_id == target_id:
+                    continue
+                if (user_id, target_id) in seen:
+                    continue
+                seen.add((user_id, target_id))
+                yield model(user_id=user_id, **{target_field: target_id})
+
+        self.bulk_create(model, pairs(), count, ignore_conflicts=True)
@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from foodgram.models import Ingredient
+from foodgram.utils import batched
+
+CSV_HEADER = ['name', 'measurement_unit']
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and row == CSV_HEADER:
+            continue
+        if not any(cell.strip() for cell in row):
+            # Пустая строка попадёт в число пропущенных.
+            yield '', ''
+            continue
+        if len(row) != 2:
+            raise CommandError(
+                f'Line {reader.line_num}: expected name and unit, got {row}'
+            )
+        yield row
+
+
+def read_json(file):
+    """
+    Читает массив объектов {"name", "measurement_unit"} по одному,
+    не загружая весь файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Expected a JSON array of ingredients')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Unexpected end of JSON array')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        try:
+            yield item['name'], item['measurement_unit']
+        except (KeyError, TypeError):
+            raise CommandError(f'Invalid ingredient: {item}')
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads ingredients from CSV or JSON files, '
+        'skipping ingredients that already exist'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=[settings.INGREDIENTS_DATA],
+            help='CSV (name,unit) or JSON files, INGREDIENTS_DATA setting '
+                 'by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        max_length = Ingredient._meta.get_field('name').max_length
+        created = 0
+        for path in options['paths']:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in READERS:
+                raise CommandError(f'Unsupported file type: {path}')
+            if not os.path.isfile(path):
+                raise CommandError(
+                    f'File not found: {path}. Pass the path explicitly '
+                    'or set the INGREDIENTS_DATA environment variable'
+                )
+            self.stdout.write(f'Loading ingredients from {path}')
+            read, skipped = 0, 0
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = (
+                    (name.strip(), unit.strip())
+                    for name, unit in READERS[extension](file)
+                )
+                for batch in batched(rows, options['batch_size']):
+                    read += len(batch)
+                    valid = [
+                        row for row in batch
+                        if row[0] and max(map(len, row)) <= max_length
+                    ]
+                    skipped += len(batch) - len(valid)
+                    created += Ingredient.objects.load(valid)
+                    self.stdout.write(f'{path}: {read} rows read')
+            if skipped:
+                self.stderr.write(f'{path}: {skipped} invalid rows skipped')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingredients created: {created}'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from foodgram.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds users subscription feeds from their subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Rebuild only the given user, can be repeated'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = FeedEntry.objects.rebuild(
+            options['user_ids'], options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Feed entries rebuilt: {created}'
+        ))
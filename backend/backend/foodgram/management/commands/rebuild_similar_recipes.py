@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+from foodgram.models import SimilarityBucket
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes MinHash LSH buckets used to find recipes '
+        'with similar ingredients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = SimilarityBucket.objects.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Similarity buckets rebuilt: {created}'
+        ))
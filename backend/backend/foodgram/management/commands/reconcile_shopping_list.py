@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from foodgram.models import ShoppingListIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds shopping list ingredient totals from the recipes '
+        'in users shopping lists'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Rebuild only the given user, can be repeated'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = ShoppingListIngredient.objects.rebuild(
+            options['user_ids'], options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Shopping list ingredients rebuilt: {created}'
+        ))
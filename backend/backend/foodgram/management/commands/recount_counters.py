@@ -0,0 +1,61 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from foodgram.models import Favorite, Recipe, ShoppingList, Subscription
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def count_related(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('id')
+        ).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes favorites, shopping list, recipes and subscribers '
+        'counters in batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, field, related, related_field in COUNTERS:
+            updated = self.recount(
+                model, field, related, related_field, options['batch_size']
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural} {field}: {updated}'
+            )
+        self.stdout.write(self.style.SUCCESS('Counters recomputed'))
+
+    def recount(self, model, field, related, related_field, batch_size):
+        """
+        Пересчитывает счётчик пачками по возрастанию id,
+        чтобы не блокировать всю таблицу одной транзакцией.
+        """
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(model.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return updated
+            with transaction.atomic():
+                updated += model.objects.filter(id__in=ids).exclude(**{
+                    field: count_related(related, related_field)
+                }).update(**{field: count_related(related, related_field)})
+            last_id = ids[-1]
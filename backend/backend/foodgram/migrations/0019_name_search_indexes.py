@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Django сравнивает istartswith/icontains как UPPER("name"::text) LIKE ...,
+# поэтому индексы строятся по тому же выражению.
+INDEXES = (
+    ('foodgram_ingredient', 'foodgram_ingredient_name_upper_like',
+     'UPPER(name::text) text_pattern_ops', 'btree'),
+    ('foodgram_ingredient', 'foodgram_ingredient_name_upper_trgm',
+     'UPPER(name::text) gin_trgm_ops', 'gin'),
+    ('foodgram_recipe', 'foodgram_recipe_name_upper_like',
+     'UPPER(name::text) text_pattern_ops', 'btree'),
+    ('foodgram_recipe', 'foodgram_recipe_name_upper_trgm',
+     'UPPER(name::text) gin_trgm_ops', 'gin'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, name, expression, method in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} '
+            f'ON {table} USING {method} ({expression})'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, name, expression, method in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0018_auto_20220826_1657'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    ShoppingList = apps.get_model('foodgram', 'ShoppingList')
+    duplicates = ShoppingList.objects.values('user', 'recipe').annotate(
+        first_id=models.Min('id'),
+        count=models.Count('id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        ShoppingList.objects.filter(
+            user=duplicate['user'],
+            recipe=duplicate['recipe']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0019_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_list'),
+        ),
+    ]
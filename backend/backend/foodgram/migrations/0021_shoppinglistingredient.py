@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_shopping_list_ingredients(apps, schema_editor):
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    ShoppingListIngredient = apps.get_model(
+        'foodgram', 'ShoppingListIngredient'
+    )
+    totals = RecipeIngredient.objects.filter(
+        recipe__shoppinglist__isnull=False
+    ).order_by().values(
+        'recipe__shoppinglist__user',
+        'ingredient'
+    ).annotate(total=models.Sum('amount'))
+    ShoppingListIngredient.objects.bulk_create(
+        [
+            ShoppingListIngredient(
+                user_id=row['recipe__shoppinglist__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total']
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0020_shoppinglist_unique_shopping_list'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoppinglistingredient', to='foodgram.Ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoppinglistingredient', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списка покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_list_ingredients,
+            migrations.RunPython.noop
+        ),
+    ]
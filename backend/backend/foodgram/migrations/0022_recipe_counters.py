@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:33
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('id')
+        ).values('total')
+    ), 0)
+
+
+def fill_recipe_counters(apps, schema_editor):
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    Favorite = apps.get_model('foodgram', 'Favorite')
+    ShoppingList = apps.get_model('foodgram', 'ShoppingList')
+    Recipe.objects.update(
+        favorites_count=count_related(Favorite, 'recipe'),
+        shopping_count=count_related(ShoppingList, 'recipe')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0021_shoppinglistingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-shopping_count', '-id'], name='recipe_shopping_count_idx'),
+        ),
+        migrations.RunPython(fill_recipe_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0022_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Уменьшенные копии картинки'),
+        ),
+    ]
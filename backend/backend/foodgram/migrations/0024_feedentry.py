@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feed_entries(apps, schema_editor):
+    Subscription = apps.get_model('foodgram', 'Subscription')
+    FeedEntry = apps.get_model('foodgram', 'FeedEntry')
+    rows = Subscription.objects.filter(
+        author__recipes__isnull=False
+    ).values_list('user_id', 'author__recipes__id', 'author_id')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id)
+            for user_id, recipe_id, author_id in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0023_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='foodgram.Recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(
+            fill_feed_entries,
+            migrations.RunPython.noop
+        ),
+    ]
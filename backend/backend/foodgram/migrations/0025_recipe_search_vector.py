@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Колонка search_vector не объявлена в модели, чтобы не загружаться
+# вместе с рецептом. Её заполняет триггер при изменении названия
+# или описания: название весит больше описания.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({row}text, '')), 'B')"
+)
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE foodgram_recipe '
+        'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+    )
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION foodgram_recipe_search_vector_update() '
+        'RETURNS trigger AS $$ BEGIN '
+        f'NEW.search_vector := {SEARCH_VECTOR.format(row="NEW.")}; '
+        'RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS foodgram_recipe_search_vector '
+        'ON foodgram_recipe'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER foodgram_recipe_search_vector '
+        'BEFORE INSERT OR UPDATE OF name, text ON foodgram_recipe '
+        'FOR EACH ROW EXECUTE PROCEDURE '
+        'foodgram_recipe_search_vector_update()'
+    )
+    schema_editor.execute(
+        'UPDATE foodgram_recipe '
+        f'SET search_vector = {SEARCH_VECTOR.format(row="")}'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS foodgram_recipe_search_vector_gin '
+        'ON foodgram_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS foodgram_recipe_search_vector '
+        'ON foodgram_recipe'
+    )
+    schema_editor.execute(
+        'DROP FUNCTION IF EXISTS foodgram_recipe_search_vector_update()'
+    )
+    schema_editor.execute(
+        'ALTER TABLE foodgram_recipe DROP COLUMN IF EXISTS search_vector'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0024_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
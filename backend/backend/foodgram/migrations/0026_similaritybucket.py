@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:54
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from foodgram.similarity import lsh_buckets
+
+
+def fill_similarity_buckets(apps, schema_editor):
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    SimilarityBucket = apps.get_model('foodgram', 'SimilarityBucket')
+    ingredients = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+    ).values_list('recipe_id', 'ingredient_id').iterator():
+        ingredients[recipe_id].add(ingredient_id)
+    SimilarityBucket.objects.bulk_create(
+        (
+            SimilarityBucket(recipe_id=recipe_id, bucket=bucket)
+            for recipe_id, ingredient_ids in ingredients.items()
+            for bucket in lsh_buckets(ingredient_ids)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0025_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True, verbose_name='Корзина')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='foodgram.Recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Корзина похожих рецептов',
+                'verbose_name_plural': 'Корзины похожих рецептов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similaritybucket',
+            constraint=models.UniqueConstraint(fields=('recipe', 'bucket'), name='unique_similarity_bucket'),
+        ),
+        migrations.RunPython(
+            fill_similarity_buckets,
+            migrations.RunPython.noop
+        ),
+    ]
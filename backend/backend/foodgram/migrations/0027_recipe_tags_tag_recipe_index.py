@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Индекс (tag_id, recipe_id) для фильтра рецептов по тэгам:
+    подзапрос EXISTS находит строку по тэгу и рецепту одним поиском.
+    """
+
+    dependencies = [
+        ('foodgram', '0026_similaritybucket'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS foodgram_recipe_tags_tag_recipe '
+            'ON foodgram_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX IF EXISTS foodgram_recipe_tags_tag_recipe'
+        ),
+    ]
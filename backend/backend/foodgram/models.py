@@ -1,9 +1,51 @@
+import csv
+import heapq
+import io
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models.functions import Greatest, RowNumber
+from users.models import CounterFieldsMixin
+
+from .signals import ingredients_loaded
+from .similarity import jaccard, lsh_buckets
+from .utils import batched
 
 User = get_user_model()
 
 
+def change_counter(queryset, field, delta):
+    """
+    Меняет счётчик одним UPDATE с F-выражением,
+    поэтому параллельные запросы не теряют изменения.
+    """
+    queryset.update(**{field: Greatest(models.F(field) + delta, 0)})
+
+
+def user_id_batches(user_ids=None, batch_size=1000):
+    """
+    Id пользователей пачками по batch_size.
+    Без user_ids перебираются все пользователи по возрастанию id,
+    не загружая весь список в память.
+    """
+    if user_ids is not None:
+        yield from batched(user_ids, batch_size)
+        return
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
 class Tag(models.Model):
     """
     Модель для тэгов рецептов.
@@ -27,6 +69,78 @@ class Tag(models.Model):
         return self.name
 
 
+class IngredientQuerySet(models.QuerySet):
+    """
+    Набор запросов для справочника ингредиентов.
+    """
+
+    def load(self, rows):
+        """
+        Добавляет пачку пар (название, единица измерения).
+        Уже существующие пары пропускаются, поэтому повторная загрузка
+        того же справочника ничего не меняет. Сигналы сохранения
+        не отправляются, вместо них после фиксации транзакции
+        отправляется сигнал ingredients_loaded.
+        Возвращает число добавленных ингредиентов.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        if connections[self.db].vendor == 'postgresql':
+            created = self.copy_rows(rows)
+        else:
+            created = self.insert_rows(rows)
+        if created:
+            transaction.on_commit(
+                lambda: ingredients_loaded.send(sender=self.model),
+                using=self.db
+            )
+        return created
+
+    def insert_rows(self, rows):
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = self.count()
+            self.bulk_create(
+                (
+                    self.model(name=name, measurement_unit=unit)
+                    for name, unit in rows
+                ),
+                ignore_conflicts=True
+            )
+            return self.count() - before
+
+    def copy_rows(self, rows):
+        """
+        Загружает пачку через COPY во временную таблицу и переносит
+        новые пары одним INSERT ... ON CONFLICT по уникальному ограничению.
+        """
+        table = self.model._meta.db_table
+        staging = f'{table}_import'
+        data = io.StringIO()
+        csv.writer(data).writerows(rows)
+        data.seek(0)
+        with transaction.atomic(using=self.db, savepoint=False):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} '
+                    '(name varchar(200), measurement_unit varchar(200)) '
+                    'ON COMMIT DROP'
+                )
+                cursor.execute(f'TRUNCATE {staging}')
+                cursor.copy_expert(
+                    f'COPY {staging} (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    data
+                )
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    f'SELECT DISTINCT name, measurement_unit FROM {staging} '
+                    'ON CONFLICT ON CONSTRAINT ingredient_measurement_unit '
+                    'DO NOTHING'
+                )
+                return cursor.rowcount
+
+
 class Ingredient(models.Model):
     """
     Модель для ингредиентов.
@@ -35,6 +149,8 @@ class Ingredient(models.Model):
     name = models.CharField('Название', max_length=200)
     measurement_unit = models.CharField('Единица измерения', max_length=200)
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -49,7 +165,122 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """
+    Набор запросов для рецептов.
+    Позволяет одним запросом получить флаги, зависящие от пользователя,
+    и заранее подгрузить все связанные объекты для сериализации.
+    """
+
+    def with_user_flags(self, user):
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                author_is_subscribed=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingList.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            ),
+            author_is_subscribed=models.Exists(
+                Subscription.objects.filter(
+                    user=user,
+                    author=models.OuterRef('author')
+                )
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """
+        Последние рецепты нескольких авторов одним запросом.
+        Ограничение числа рецептов на автора считается оконной
+        функцией ROW_NUMBER. Django не умеет фильтровать по оконным
+        выражениям, поэтому нумерация выполняется во вложенном запросе.
+        """
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return recipes
+        ranked = recipes.annotate(recipe_rank=models.Window(
+            expression=RowNumber(),
+            partition_by=[models.F('author')],
+            order_by=models.F('id').desc()
+        )).order_by().values('id', 'recipe_rank')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            # Пустой список авторов: запрос заведомо ничего не вернёт.
+            return self.none()
+        return recipes.extra(
+            where=[
+                f'{self.model._meta.db_table}.id IN ('
+                f'SELECT id FROM ({sql}) AS ranked WHERE recipe_rank <= %s)'
+            ],
+            params=(*params, limit)
+        )
+
+    def search(self, value):
+        """
+        Полнотекстовый поиск по названию и описанию.
+        На PostgreSQL используется колонка search_vector с русской
+        морфологией, которую поддерживает триггер из миграции:
+        совпадения в названии весят больше, чем в описании.
+        На других базах слова ищутся как подстроки.
+        Релевантность записывается в search_rank.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return self.search_words(value.split())
+        table = self.model._meta.db_table
+        query = "websearch_to_tsquery('russian', %s)"
+        return self.extra(
+            select={'search_rank': f'ts_rank({table}.search_vector, {query})'},
+            select_params=(value,),
+            where=[f'{table}.search_vector @@ {query}'],
+            params=(value,)
+        )
+
+    def search_words(self, words):
+        recipes = self
+        rank = models.Value(0.0, output_field=models.FloatField())
+        for word in words:
+            recipes = recipes.filter(
+                models.Q(name__icontains=word) | models.Q(text__icontains=word)
+            )
+            rank += models.Case(
+                models.When(name__icontains=word, then=models.Value(1.0)),
+                default=models.Value(0.4),
+                output_field=models.FloatField()
+            )
+        return recipes.annotate(search_rank=rank)
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """
     Модель для рецептов.
     """
@@ -76,6 +307,12 @@ class Recipe(models.Model):
         'Картинка',
         upload_to='recipes/',
     )
+    image_renditions = models.TextField(
+        'Уменьшенные копии картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
     text = models.TextField('Описание')
     cooking_time = models.PositiveIntegerField(
         'Время приготовления (в минутах)'
@@ -86,9 +323,33 @@ class Recipe(models.Model):
         through='recipeingredient',
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'shopping_count')
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['-shopping_count', '-id'],
+                name='recipe_shopping_count_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -116,6 +377,12 @@ class ShoppingList(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_list'
+            )
+        ]
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
 
@@ -217,3 +484,451 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return f'{self.recipe} - {self.ingredient} - {self.amount}'
+
+
+class ShoppingListIngredientQuerySet(models.QuerySet):
+    """
+    Набор запросов для суммарного списка покупок.
+    Суммы ингредиентов меняются на разницу при добавлении
+    и удалении рецептов и при изменении ингредиентов рецепта.
+    Методы, меняющие суммы, вызываются внутри транзакции
+    после блокировки рецептов методом lock_recipes и пользователей
+    методом lock_users, всегда в этом порядке.
+    """
+
+    def lock_recipes(self, recipe_ids):
+        """
+        Блокирует рецепты, пока меняются суммы по их ингредиентам.
+        Изменение состава рецепта и добавление его в список покупок
+        выполняются по очереди, и ни одно изменение не теряется.
+        """
+        list(Recipe.objects.select_for_update().filter(
+            id__in=recipe_ids
+        ).order_by('id').values_list('id', flat=True))
+
+    def lock_users(self, user_ids):
+        list(User.objects.select_for_update().filter(
+            id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+
+    def recipe_amounts(self, recipe_ids):
+        return dict(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient').annotate(
+            total=models.Sum('amount')
+        ).values_list('ingredient', 'total'))
+
+    def add_recipes(self, user_ids, recipe_ids):
+        self.change(user_ids, self.recipe_amounts(recipe_ids))
+
+    def remove_recipes(self, user_ids, recipe_ids):
+        self.change(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount in self.recipe_amounts(
+                recipe_ids
+            ).items()
+        })
+
+    def change(self, user_ids, deltas):
+        """
+        Прибавляет к суммам пользователей разницу по ингредиентам.
+        Число запросов не зависит от количества ингредиентов:
+        существующие строки читаются одним запросом, затем
+        изменяются, создаются и удаляются пачками.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        existing = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(
+                user_id__in=user_ids,
+                ingredient_id__in=deltas
+            )
+        }
+        created, updated, deleted = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                item = existing.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        created.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=delta
+                        ))
+                    continue
+                item.amount += delta
+                if item.amount > 0:
+                    updated.append(item)
+                else:
+                    deleted.append(item.id)
+        if created:
+            self.bulk_create(created)
+        if updated:
+            self.bulk_update(updated, ['amount'])
+        if deleted:
+            self.filter(id__in=deleted).delete()
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """
+        Пересчитывает суммы заново по рецептам в списках покупок.
+        Без user_ids пересчитываются списки всех пользователей.
+        Пользователи обрабатываются пачками, каждая в своей транзакции.
+        """
+        created = 0
+        for batch in user_id_batches(user_ids, batch_size):
+            created += self.rebuild_users(batch, batch_size)
+        return created
+
+    def rebuild_users(self, user_ids, batch_size):
+        totals = RecipeIngredient.objects.filter(
+            recipe__shoppinglist__user__in=user_ids
+        ).order_by().values(
+            'recipe__shoppinglist__user',
+            'ingredient'
+        ).annotate(total=models.Sum('amount'))
+        created = 0
+        with transaction.atomic():
+            self.lock_users(user_ids)
+            self.filter(user_id__in=user_ids).delete()
+            for rows in batched(totals.iterator(), batch_size):
+                created += len(self.bulk_create([
+                    self.model(
+                        user_id=row['recipe__shoppinglist__user'],
+                        ingredient_id=row['ingredient'],
+                        amount=row['total']
+                    )
+                    for row in rows
+                ]))
+        return created
+
+
+class ShoppingListIngredient(models.Model):
+    """
+    Модель для суммарного списка покупок пользователя.
+    Хранит общее количество каждого ингредиента по всем рецептам
+    в списке покупок, чтобы выгрузка не пересчитывала его заново.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shoppinglistingredient'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shoppinglistingredient'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListIngredientQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient'
+            )
+        ]
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient} - {self.amount}'
+
+
+class MergedTimeline:
+    """
+    Слияние нескольких наборов строк {'recipe_id': ...}
+    с одинаковой сортировкой. Поддерживает операции, которые нужны
+    курсорной пагинации: order_by, filter и срез. Срез читает
+    из каждого набора не больше строк, чем нужно для страницы.
+    """
+
+    def __init__(self, *sources, descending=True):
+        self.sources = sources
+        self.descending = descending
+
+    def order_by(self, field):
+        return MergedTimeline(
+            *(source.order_by(field) for source in self.sources),
+            descending=field.startswith('-')
+        )
+
+    def filter(self, **kwargs):
+        return MergedTimeline(
+            *(source.filter(**kwargs) for source in self.sources),
+            descending=self.descending
+        )
+
+    def __getitem__(self, index):
+        rows = heapq.merge(
+            *(source[:index.stop] for source in self.sources),
+            key=itemgetter('recipe_id'),
+            reverse=self.descending
+        )
+        return list(islice(rows, index.start, index.stop))
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    """
+    Набор запросов для лент рецептов авторов из подписок.
+    Рецепт записывается в ленты подписчиков при публикации.
+    Авторам с очень большим числом подписчиков рассылка не делается:
+    их рецепты добавляются к ленте при чтении методом timeline.
+    """
+
+    def create_entries(self, rows, batch_size=1000):
+        """
+        Сохраняет строки (user_id, recipe_id, author_id) пачками,
+        не собирая их все в памяти.
+        """
+        created = 0
+        for batch in batched(rows, batch_size):
+            created += len(self.bulk_create(
+                [
+                    self.model(user_id=user_id, recipe_id=recipe_id,
+                               author_id=author_id)
+                    for user_id, recipe_id, author_id in batch
+                ],
+                ignore_conflicts=True
+            ))
+        return created
+
+    def fan_out(self, recipe, batch_size=1000):
+        subscribers = Subscription.objects.filter(
+            author_id=recipe.author_id,
+            author__subscribers_count__lte=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            )
+        ).values_list('user_id', flat=True)
+        return self.create_entries(
+            (
+                (user_id, recipe.id, recipe.author_id)
+                for user_id in subscribers.iterator()
+            ),
+            batch_size
+        )
+
+    def backfill(self, user_id, author_ids):
+        """
+        Добавляет в ленту последние рецепты авторов,
+        например при подписке на нового автора.
+        """
+        recipes = Recipe.objects.latest_by_author(
+            author_ids, settings.FEED_BACKFILL_SIZE
+        ).values_list('id', 'author_id')
+        return self.create_entries(
+            (user_id, recipe_id, author_id)
+            for recipe_id, author_id in recipes
+        )
+
+    def timeline(self, user):
+        """
+        Лента пользователя в виде строк {'recipe_id': ...}.
+        Обычно это один проход по индексу (user, recipe).
+        Если среди подписок есть авторы без рассылки, их рецепты
+        сливаются с записями ленты при чтении, ничего не записывая.
+        """
+        entries = self.filter(user=user).values('recipe_id')
+        authors = list(Subscription.objects.filter(
+            user=user,
+            author__subscribers_count__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+        ).values_list('author_id', flat=True))
+        if not authors:
+            return entries
+        return MergedTimeline(
+            entries.exclude(author_id__in=authors),
+            Recipe.objects.filter(author_id__in=authors).values(
+                recipe_id=models.F('id')
+            )
+        )
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """
+        Заполняет ленты заново по подпискам.
+        Без user_ids пересчитываются ленты всех пользователей.
+        Пользователи обрабатываются пачками, каждая в своей транзакции.
+        Рецепты авторов без рассылки не записываются, timeline
+        добавляет их при чтении.
+        """
+        created = 0
+        for batch in user_id_batches(user_ids, batch_size):
+            created += self.rebuild_users(batch, batch_size)
+        return created
+
+    def rebuild_users(self, user_ids, batch_size):
+        subscriptions = Subscription.objects.filter(
+            user_id__in=user_ids,
+            author__subscribers_count__lte=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            )
+        )
+        authors_recipes = defaultdict(list)
+        for recipe_id, author_id in Recipe.objects.latest_by_author(
+            subscriptions.values('author_id'), settings.FEED_BACKFILL_SIZE
+        ).values_list('id', 'author_id').iterator():
+            authors_recipes[author_id].append(recipe_id)
+        with transaction.atomic():
+            self.filter(user_id__in=user_ids).delete()
+            return self.create_entries(
+                (
+                    (user_id, recipe_id, author_id)
+                    for user_id, author_id in subscriptions.values_list(
+                        'user_id', 'author_id'
+                    ).iterator()
+                    for recipe_id in authors_recipes[author_id]
+                ),
+                batch_size
+            )
+
+
+class FeedEntry(models.Model):
+    """
+    Модель для ленты подписок пользователя.
+    Лента читается одним проходом по индексу (user, recipe)
+    в порядке убывания id рецепта.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
+
+
+class SimilarityBucketQuerySet(models.QuerySet):
+    """
+    Набор запросов для корзин LSH похожих рецептов.
+    Корзины пересчитываются при изменении состава рецепта,
+    поиск похожих читает только рецепты из общих корзин.
+    """
+
+    def assign(self, ingredients, replace=True):
+        """
+        Записывает корзины рецептов по словарю id рецепта -> множество
+        id ингредиентов. С replace прежние корзины рецептов удаляются.
+        """
+        with transaction.atomic(savepoint=False):
+            if replace:
+                self.filter(recipe_id__in=list(ingredients)).delete()
+            return len(self.bulk_create(
+                self.model(recipe_id=recipe_id, bucket=bucket)
+                for recipe_id, ingredient_ids in ingredients.items()
+                for bucket in lsh_buckets(ingredient_ids)
+            ))
+
+    def update_recipes(self, recipe_ids):
+        ingredients = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+        return self.assign(ingredients)
+
+    def rebuild(self, batch_size=1000):
+        """
+        Пересчитывает корзины всех рецептов пачками по возрастанию id.
+        """
+        last_id = 0
+        created = 0
+        while True:
+            ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return created
+            created += self.update_recipes(ids)
+            last_id = ids[-1]
+
+    def similar(self, recipe_id, limit):
+        """
+        Похожие рецепты и их коэффициент Жаккара по ингредиентам.
+        Кандидаты - рецепты с наибольшим числом общих корзин,
+        точный коэффициент считается только для них.
+        """
+        candidates = list(self.filter(
+            bucket__in=self.filter(recipe_id=recipe_id).values('bucket')
+        ).exclude(recipe_id=recipe_id).order_by().values('recipe_id').annotate(
+            bands=models.Count('id')
+        ).order_by('-bands', '-recipe_id').values_list(
+            'recipe_id', flat=True
+        )[:settings.SIMILAR_RECIPES_CANDIDATES])
+        if not candidates:
+            return []
+        ingredients = defaultdict(set)
+        for candidate_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=[recipe_id, *candidates]
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            ingredients[candidate_id].add(ingredient_id)
+        scores = sorted(
+            (
+                (jaccard(ingredients[recipe_id], ingredients[candidate_id]),
+                 candidate_id)
+                for candidate_id in candidates
+                if ingredients[candidate_id]
+            ),
+            reverse=True
+        )
+        return [
+            (candidate_id, score) for score, candidate_id in scores[:limit]
+        ]
+
+
+class SimilarityBucket(models.Model):
+    """
+    Модель для корзины LSH рецепта.
+    Рецепты с общей корзиной - кандидаты в похожие.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets'
+    )
+    bucket = models.BigIntegerField('Корзина', db_index=True)
+
+    objects = SimilarityBucketQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'bucket'],
+                name='unique_similarity_bucket'
+            )
+        ]
+        verbose_name = 'Корзина похожих рецептов'
+        verbose_name_plural = 'Корзины похожих рецептов'
+
+    def __str__(self):
+        return f'{self.recipe} - {self.bucket}'
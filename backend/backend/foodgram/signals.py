@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Ингредиенты добавлены пачкой без сигналов post_save.
+ingredients_loaded = Signal()
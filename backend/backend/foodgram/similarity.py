@@ -0,0 +1,50 @@
+import hashlib
+import random
+from functools import lru_cache
+
+from django.conf import settings
+
+PRIME = (1 << 61) - 1
+
+
+@lru_cache(maxsize=None)
+def hash_functions(count, seed):
+    rand = random.Random(seed)
+    return tuple(
+        (rand.randrange(1, PRIME), rand.randrange(PRIME))
+        for _ in range(count)
+    )
+
+
+def minhash(ingredient_ids, functions):
+    return [
+        min((a * value + b) % PRIME for value in ingredient_ids)
+        for a, b in functions
+    ]
+
+
+def lsh_buckets(ingredient_ids):
+    """
+    Корзины LSH для набора ингредиентов.
+    Подпись MinHash делится на полосы, каждая полоса вместе с её номером
+    хэшируется в одну корзину. Рецепты с большим коэффициентом Жаккара
+    с высокой вероятностью совпадают хотя бы по одной корзине.
+    """
+    if not ingredient_ids:
+        return []
+    signature = minhash(ingredient_ids, hash_functions(
+        settings.SIMILAR_RECIPES_PERMUTATIONS,
+        settings.SIMILAR_RECIPES_SEED
+    ))
+    rows = len(signature) // settings.SIMILAR_RECIPES_BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(
+            repr((band, signature[band * rows:(band + 1) * rows])).encode(),
+            digest_size=8
+        ).digest(), 'big', signed=True)
+        for band in range(settings.SIMILAR_RECIPES_BANDS)
+    ]
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
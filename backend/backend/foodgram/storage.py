@@ -0,0 +1,38 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """
+    Файловое хранилище, в котором имя файла - хэш его содержимого.
+    Одинаковые файлы хранятся один раз: повторное сохранение
+    возвращает имя уже лежащего файла. Содержимое файла
+    под именем никогда не меняется, поэтому его можно кэшировать навсегда.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Обновлённое время изменения защищает файл от сборки мусора,
+            # пока ссылающийся на него рецепт ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, file_name = posixpath.split(name)
+        extension = posixpath.splitext(file_name)[1].lower()
+        return posixpath.join(directory, f'{digest.hexdigest()}{extension}')
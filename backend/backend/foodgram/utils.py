@@ -0,0 +1,13 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """
+    Разбивает iterable на списки не длиннее size.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,144 @@
+import random
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingList,
+                             ShoppingListIngredient, SimilarityBucket,
+                             Subscription, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+TAGS_COUNT = 3
+INGREDIENTS_COUNT = 60
+AUTHORS_COUNT = 8
+RECIPES_PER_AUTHOR = 5
+INGREDIENTS_PER_RECIPE = 8
+FAVORITES_COUNT = 15
+SHOPPING_LIST_COUNT = 10
+SUBSCRIPTIONS_COUNT = 6
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ]
+    cache.clear()
+
+
+@pytest.fixture
+def dataset(db):
+    """
+    Набор данных, приближенный к боевому: несколько авторов с рецептами,
+    у каждого рецепта несколько тэгов и ингредиентов, у пользователя
+    есть избранное, список покупок и подписки.
+    """
+    rand = random.Random(0)
+    tags = [
+        Tag.objects.create(
+            name=f'Тэг {number}',
+            slug=f'tag{number}',
+            color=f'#00000{number}'
+        )
+        for number in range(TAGS_COUNT)
+    ]
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS_COUNT)
+    )
+    ingredients = list(Ingredient.objects.all())
+    user = User.objects.create_user(
+        username='user',
+        email='user@foodgram.ru',
+        password='password',
+        first_name='Пользователь',
+        last_name='Тестовый'
+    )
+    authors = [
+        User.objects.create_user(
+            username=f'author{number}',
+            email=f'author{number}@foodgram.ru',
+            password='password',
+            first_name='Автор',
+            last_name=str(number)
+        )
+        for number in range(AUTHORS_COUNT)
+    ]
+    Recipe.objects.bulk_create(
+        Recipe(
+            name=f'Рецепт {author.username} {number}',
+            author=author,
+            image='recipes/image.png',
+            text='Описание рецепта',
+            cooking_time=number + 1
+        )
+        for author in authors
+        for number in range(RECIPES_PER_AUTHOR)
+    )
+    recipes = list(Recipe.objects.all())
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=rand.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rand.sample(ingredients, INGREDIENTS_PER_RECIPE)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rand.sample(tags, 2)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe)
+        for recipe in recipes[:FAVORITES_COUNT]
+    )
+    ShoppingList.objects.bulk_create(
+        ShoppingList(user=user, recipe=recipe)
+        for recipe in recipes[:SHOPPING_LIST_COUNT]
+    )
+    ShoppingListIngredient.objects.rebuild()
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author)
+        for author in authors[:SUBSCRIPTIONS_COUNT]
+    )
+    call_command('recount_counters', stdout=StringIO())
+    FeedEntry.objects.rebuild()
+    SimilarityBucket.objects.rebuild()
+    return SimpleNamespace(
+        user=user,
+        authors=authors,
+        tags=tags,
+        ingredients=ingredients,
+        recipes=recipes,
+        own_recipe=Recipe.objects.create(
+            name='Рецепт пользователя',
+            author=user,
+            image='recipes/image.png',
+            text='Описание рецепта',
+            cooking_time=10
+        ),
+    )
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(dataset):
+    client = APIClient()
+    token = Token.objects.create(user=dataset.user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
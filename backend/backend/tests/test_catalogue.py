@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.management import call_command
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingList,
+                             ShoppingListIngredient, SimilarityBucket,
+                             Subscription, Tag)
+from users.models import User
+
+
+def snapshot():
+    """
+    Каталог в виде естественных ключей, не зависящих от id.
+    """
+    return {
+        'recipes': {
+            (recipe.name, recipe.author.username, recipe.favorites_count,
+             frozenset(tag.slug for tag in recipe.tags.all()),
+             frozenset(
+                 (item.ingredient.name, item.amount)
+                 for item in recipe.recipeingredient.all()
+             ))
+            for recipe in Recipe.objects.with_related()
+        },
+        'favorites': set(Favorite.objects.values_list(
+            'user__username', 'recipe__name'
+        )),
+        'shopping': set(ShoppingList.objects.values_list(
+            'user__username', 'recipe__name'
+        )),
+        'subscriptions': set(Subscription.objects.values_list(
+            'user__username', 'author__username'
+        )),
+        'totals': set(ShoppingListIngredient.objects.values_list(
+            'user__username', 'ingredient__name', 'amount'
+        )),
+        'feed': FeedEntry.objects.count(),
+        'password': User.objects.get(username='user').password,
+    }
+
+
+def export(path):
+    call_command('export_catalogue', str(path), batch_size=7,
+                 stderr=StringIO())
+
+
+def import_(path):
+    out = StringIO()
+    call_command('import_catalogue', str(path), batch_size=7, stdout=out)
+    return out.getvalue()
+
+
+def test_export_import_remaps_ids(dataset, tmp_path):
+    path = tmp_path / 'catalogue.ndjson.gz'
+    export(path)
+    expected = snapshot()
+
+    for model in (Recipe, User, Tag, Ingredient):
+        model.objects.all().delete()
+    # Новые записи получат другие id, чем в выгрузке.
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    User.objects.create_user(username='other', email='other@foodgram.ru')
+
+    import_(path)
+    assert snapshot() == expected
+    assert SimilarityBucket.objects.exists()
+    assert User.objects.get(username='user').check_password('password')
+
+
+def test_import_is_idempotent(dataset, tmp_path):
+    path = tmp_path / 'catalogue.ndjson'
+    export(path)
+    expected = snapshot()
+    counts = [model.objects.count() for model in (
+        User, Tag, Ingredient, Recipe, RecipeIngredient, Favorite,
+        Subscription
+    )]
+    assert 'Catalogue imported' in import_(path)
+    assert snapshot() == expected
+    assert counts == [model.objects.count() for model in (
+        User, Tag, Ingredient, Recipe, RecipeIngredient, Favorite,
+        Subscription
+    )]
+
+
+def test_export_streams_ndjson(dataset, tmp_path):
+    path = tmp_path / 'catalogue.ndjson'
+    export(path)
+    lines = path.read_text(encoding='utf-8').splitlines()
+    recipes = [line for line in lines if '"type": "recipe"' in line]
+    assert len(recipes) == Recipe.objects.count()
+    assert len(lines) == sum((
+        User.objects.count(), Tag.objects.count(), Ingredient.objects.count(),
+        Recipe.objects.count(), Favorite.objects.count(),
+        ShoppingList.objects.count(), Subscription.objects.count()
+    ))
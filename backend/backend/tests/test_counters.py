@@ -0,0 +1,122 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Favorite, Recipe, ShoppingList, Subscription
+from users.models import User
+
+from .test_query_budget import count_queries
+
+
+def refresh(*objects):
+    for obj in objects:
+        obj.refresh_from_db()
+
+
+def test_counters_match_dataset(dataset):
+    for recipe in Recipe.objects.all():
+        assert recipe.favorites_count == recipe.favorite.count()
+        assert recipe.shopping_count == recipe.shoppinglist.count()
+    for user in User.objects.all():
+        assert user.recipes_count == user.recipes.count()
+        assert user.subscribers_count == user.subscribed.count()
+
+
+def test_recipe_counters_follow_toggles(user_client, dataset):
+    recipe = dataset.recipes[-1]
+    for url, field in (
+        (f'/api/recipes/{recipe.id}/favorite/', 'favorites_count'),
+        (f'/api/recipes/{recipe.id}/shopping_cart/', 'shopping_count'),
+    ):
+        user_client.post(url)
+        user_client.post(url)
+        refresh(recipe)
+        assert getattr(recipe, field) == 1
+        user_client.delete(url)
+        user_client.delete(url)
+        refresh(recipe)
+        assert getattr(recipe, field) == 0
+
+
+def test_recipe_counters_follow_bulk_toggles(user_client, dataset):
+    recipes = dataset.recipes[-3:]
+    ids = [recipe.id for recipe in recipes]
+    for url, model in (
+        ('/api/recipes/favorite/bulk/', Favorite),
+        ('/api/recipes/shopping_cart/bulk/', ShoppingList),
+    ):
+        user_client.post(url, {'ids': ids}, format='json')
+        user_client.post(url, {'ids': ids}, format='json')
+        for recipe in Recipe.objects.filter(id__in=ids):
+            assert recipe.favorites_count == recipe.favorite.count()
+            assert recipe.shopping_count == recipe.shoppinglist.count()
+        user_client.delete(url, {'ids': ids}, format='json')
+        assert not model.objects.filter(recipe_id__in=ids).exists()
+        for recipe in Recipe.objects.filter(id__in=ids):
+            assert recipe.favorites_count == recipe.favorite.count()
+            assert recipe.shopping_count == recipe.shoppinglist.count()
+
+
+def test_user_counters_follow_subscriptions_and_recipes(
+    user_client, dataset
+):
+    author = dataset.authors[-1]
+    url = f'/api/users/{author.id}/subscribe/'
+    user_client.post(url)
+    refresh(author)
+    assert author.subscribers_count == 1
+    user_client.delete(url)
+    refresh(author)
+    assert author.subscribers_count == 0
+
+    user = dataset.user
+    refresh(user)
+    recipes_count = user.recipes_count
+    user_client.delete(f'/api/recipes/{dataset.own_recipe.id}/')
+    refresh(user)
+    assert user.recipes_count == recipes_count - 1
+
+
+def test_subscriptions_read_recipes_count_without_queries(
+    user_client, dataset
+):
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get('/api/users/subscriptions/')
+    assert count_queries(context) == 1
+    for author in response.data['results']:
+        assert author['recipes_count'] == Recipe.objects.filter(
+            author_id=author['id']
+        ).count()
+
+
+def test_popularity_ordering(anonymous_client, dataset):
+    response = anonymous_client.get(
+        '/api/recipes/?ordering=-favorites_count,-id&limit=100'
+    )
+    ids = [recipe['id'] for recipe in response.data['results']]
+    assert ids == list(Recipe.objects.order_by(
+        '-favorites_count', '-id'
+    ).values_list('id', flat=True))
+
+
+def test_recount_command_fixes_drift(dataset):
+    Recipe.objects.update(favorites_count=100, shopping_count=0)
+    User.objects.update(recipes_count=0, subscribers_count=7)
+    Subscription.objects.filter(author=dataset.authors[0]).delete()
+    call_command('recount_counters', batch_size=7)
+    test_counters_match_dataset(dataset)
+
+
+def test_save_keeps_concurrent_counter_changes(user_client, dataset):
+    recipe = Recipe.objects.get(pk=dataset.recipes[-1].pk)
+    author = User.objects.get(pk=recipe.author_id)
+    user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    recipe.text = 'Новое описание'
+    recipe.save()
+    author.first_name = 'Новое имя'
+    author.save()
+    refresh(recipe, author)
+    assert recipe.text == 'Новое описание'
+    assert recipe.favorites_count == recipe.favorite.count()
+    assert author.first_name == 'Новое имя'
+    assert author.subscribers_count == author.subscribed.count()
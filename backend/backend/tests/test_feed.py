@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import FeedEntry, Recipe, Subscription
+from rest_framework.test import APIClient
+
+from .test_query_budget import recipe_payload
+
+URL = '/api/recipes/feed/'
+
+
+def feed_ids(client, limit=100):
+    ids = []
+    url = f'{URL}?limit={limit}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        url = response.data['next']
+    return ids
+
+
+def followed_recipe_ids(user):
+    return list(Recipe.objects.filter(
+        author__subscribed__user=user
+    ).order_by('-id').values_list('id', flat=True))
+
+
+@pytest.mark.parametrize('limit', [3, 100])
+def test_feed_lists_recipes_of_followed_authors(user_client, dataset, limit):
+    assert feed_ids(user_client, limit) == followed_recipe_ids(dataset.user)
+
+
+def test_feed_queries_do_not_depend_on_page_size(user_client, dataset):
+    counts = []
+    for limit in (1, 30):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(f'{URL}?limit={limit}')
+        assert len(response.data['results']) == limit
+        counts.append(len(context))
+    assert counts[0] == counts[1]
+
+
+def test_published_recipe_is_fanned_out(dataset):
+    author = dataset.authors[0]
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.post('/api/recipes/', recipe_payload(dataset),
+                           format='json')
+    assert response.status_code == 201, response.data
+    assert set(FeedEntry.objects.filter(
+        recipe_id=response.data['id']
+    ).values_list('user_id', flat=True)) == set(Subscription.objects.filter(
+        author=author
+    ).values_list('user_id', flat=True))
+
+
+def test_subscribe_and_unsubscribe_update_feed(user_client, dataset):
+    author = dataset.authors[-1]
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    assert feed_ids(user_client) == followed_recipe_ids(dataset.user)
+    assert author.recipes.exists()
+    user_client.delete(f'/api/users/{author.id}/subscribe/')
+    assert not FeedEntry.objects.filter(
+        user=dataset.user, author=author
+    ).exists()
+    assert feed_ids(user_client) == followed_recipe_ids(dataset.user)
+
+
+def test_popular_authors_are_pulled_on_read(
+    settings, user_client, dataset
+):
+    settings.FEED_FANOUT_MAX_SUBSCRIBERS = 0
+    author = dataset.authors[0]
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.post('/api/recipes/', recipe_payload(dataset),
+                           format='json')
+    assert not FeedEntry.objects.filter(
+        recipe_id=response.data['id']
+    ).exists()
+    count = FeedEntry.objects.count()
+    with CaptureQueriesContext(connection) as context:
+        ids = feed_ids(user_client, limit=2)
+    assert ids[0] == response.data['id']
+    assert ids == followed_recipe_ids(dataset.user)
+    assert FeedEntry.objects.count() == count
+    assert not any(
+        query['sql'].startswith('INSERT') for query in context.captured_queries
+    )
+
+
+def test_rebuild(dataset):
+    expected = set(FeedEntry.objects.values_list('user_id', 'recipe_id'))
+    FeedEntry.objects.filter(user=dataset.user).delete()
+    FeedEntry.objects.rebuild([dataset.user.id])
+    assert set(
+        FeedEntry.objects.values_list('user_id', 'recipe_id')
+    ) == expected
+
+
+def test_rebuild_all_users_in_batches(dataset):
+    expected = set(FeedEntry.objects.values_list('user_id', 'recipe_id'))
+    FeedEntry.objects.all().delete()
+    FeedEntry.objects.rebuild(batch_size=3)
+    assert set(
+        FeedEntry.objects.values_list('user_id', 'recipe_id')
+    ) == expected
+
+
+def test_anonymous(anonymous_client):
+    assert anonymous_client.get(URL).status_code == 401
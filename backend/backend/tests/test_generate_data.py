@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             ShoppingList, Subscription)
+from users.models import User
+
+
+def test_generate_data(db):
+    call_command(
+        'generate_data', users=5, recipes=10, ingredients_per_recipe=3,
+        favorites=10, shopping=5, subscriptions=5, batch_size=4, seed=1,
+        stdout=StringIO(), stderr=StringIO()
+    )
+    assert User.objects.count() == 5
+    assert Recipe.objects.count() == 10
+    assert Ingredient.objects.exists()
+    assert Favorite.objects.exists()
+    assert ShoppingList.objects.exists()
+    assert Subscription.objects.exists()
+    assert FeedEntry.objects.exists()
+    for image in set(Recipe.objects.values_list('image', flat=True)):
+        assert default_storage.exists(image)
+    call_command('clean_recipe_images', '--min-age=0', stdout=StringIO())
+    assert default_storage.exists(Recipe.objects.first().image.name)
@@ -0,0 +1,59 @@
+import os
+import time
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from foodgram.models import Recipe
+
+from .conftest import IMAGE
+from .test_query_budget import recipe_payload
+
+
+def create_recipe(client, dataset, name):
+    response = client.post(
+        '/api/recipes/',
+        {**recipe_payload(dataset), 'image': IMAGE, 'name': name},
+        format='json'
+    )
+    assert response.status_code == 201, response.data
+    return Recipe.objects.get(pk=response.data['id'])
+
+
+def test_identical_images_share_one_file(settings, user_client, dataset):
+    first = create_recipe(user_client, dataset, 'Первый')
+    second = create_recipe(user_client, dataset, 'Второй')
+    assert first.image.name == second.image.name
+    assert first.image.name.startswith('recipes/')
+    assert os.listdir(os.path.join(settings.MEDIA_ROOT, 'recipes')) == [
+        os.path.basename(first.image.name)
+    ]
+
+
+def test_name_depends_on_content():
+    first = default_storage.save('recipes/a.PNG', ContentFile(b'first'))
+    second = default_storage.save('recipes/b.png', ContentFile(b'second'))
+    assert first != second
+    assert first.endswith('.png')
+    assert default_storage.save('recipes/c.png', ContentFile(b'first')) == (
+        first
+    )
+
+
+def test_clean_recipe_images(user_client, dataset):
+    recipe = create_recipe(user_client, dataset, 'Рецепт')
+    unused = default_storage.save('recipes/x.png', ContentFile(b'unused'))
+    fresh = default_storage.save('recipes/y.png', ContentFile(b'fresh'))
+    old = time.time() - 3600
+    for name in (recipe.image.name, unused):
+        os.utime(default_storage.path(name), (old, old))
+
+    call_command('clean_recipe_images', '--min-age=60', '--dry-run',
+                 stdout=StringIO())
+    assert default_storage.exists(unused)
+
+    call_command('clean_recipe_images', '--min-age=60', stdout=StringIO())
+    assert default_storage.exists(recipe.image.name)
+    assert default_storage.exists(fresh)
+    assert not default_storage.exists(unused)
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Ingredient
+
+
+def test_ingredient_prefix_search_without_queries(
+    settings, anonymous_client, transactional_db
+):
+    settings.INGREDIENT_SEARCH_LIMIT = 2
+    Ingredient.objects.bulk_create([
+        Ingredient(name='ёжевика', measurement_unit='г'),
+        Ingredient(name='Ежевичный джем', measurement_unit='г'),
+        Ingredient(name='ежевичный сок', measurement_unit='мл'),
+        Ingredient(name='яблоко', measurement_unit='шт.'),
+    ])
+    response = anonymous_client.get('/api/ingredients/?name=ЕЖ')
+    assert [item['name'] for item in response.data] == [
+        'ёжевика', 'Ежевичный джем'
+    ]
+    with CaptureQueriesContext(connection) as context:
+        response = anonymous_client.get('/api/ingredients/?name=ябл')
+    assert len(context) == 0
+    assert response.data == [{
+        'id': Ingredient.objects.get(name='яблоко').id,
+        'name': 'яблоко',
+        'measurement_unit': 'шт.',
+    }]
+    Ingredient.objects.create(name='яблочный сок', measurement_unit='мл')
+    response = anonymous_client.get('/api/ingredients/?name=ябл')
+    assert len(response.data) == 2
+
+
+def test_ingredient_substring_matches_follow_prefix_matches(
+    settings, anonymous_client, db
+):
+    Ingredient.objects.bulk_create([
+        Ingredient(name='сок апельсиновый', measurement_unit='мл'),
+        Ingredient(name='соль', measurement_unit='г'),
+        Ingredient(name='апельсин', measurement_unit='шт.'),
+    ])
+    for enabled in (True, False):
+        settings.INGREDIENT_INDEX_ENABLED = enabled
+        response = anonymous_client.get('/api/ingredients/?name=апельсин')
+        assert [item['name'] for item in response.data] == [
+            'апельсин', 'сок апельсиновый'
+        ]
+
+
+def test_ingredient_index_expires_without_generation_bump(
+    settings, anonymous_client, db
+):
+    Ingredient.objects.create(name='яблоко', measurement_unit='шт.')
+    assert len(anonymous_client.get('/api/ingredients/?name=ябл').data) == 1
+    # Изменение, о котором процесс не узнал через кэш.
+    Ingredient.objects.bulk_create([
+        Ingredient(name='яблочный сок', measurement_unit='мл')
+    ])
+    assert len(anonymous_client.get('/api/ingredients/?name=ябл').data) == 1
+    settings.IN_MEMORY_INDEX_MAX_AGE = 0
+    assert len(anonymous_client.get('/api/ingredients/?name=ябл').data) == 2
@@ -0,0 +1,89 @@
+import json
+import os
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from foodgram.models import Ingredient
+
+DATA_DIR = os.path.dirname(settings.INGREDIENTS_DATA)
+
+
+def load(*args, **kwargs):
+    call_command('load_ingredients', *args, stdout=StringIO(),
+                 stderr=StringIO(), **kwargs)
+
+
+def test_load_bundled_dictionaries_is_idempotent(db):
+    csv_path = os.path.join(DATA_DIR, 'ingredients.csv')
+    json_path = os.path.join(DATA_DIR, 'ingredients.json')
+    load(csv_path, batch_size=700)
+    count = Ingredient.objects.count()
+    with open(json_path, encoding='utf-8') as file:
+        expected = {
+            (item['name'], item['measurement_unit'])
+            for item in json.load(file)
+        }
+    assert count == len(expected)
+
+    load(json_path)
+    load(csv_path)
+    assert Ingredient.objects.count() == count
+
+
+def test_load_skips_header_duplicates_and_invalid_rows(db, tmp_path):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'name,measurement_unit\n'
+        'соль,г\n'
+        '\n'
+        ' сахар ,г\n'
+        'сахар,г\n'
+        ',г\n'
+        f'{"я" * 201},г\n',
+        encoding='utf-8'
+    )
+    load(str(path), batch_size=2)
+    assert sorted(
+        Ingredient.objects.values_list('name', 'measurement_unit')
+    ) == [('сахар', 'г'), ('соль', 'г')]
+
+
+def test_load_json_in_small_chunks(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        'foodgram.management.commands.load_ingredients.JSON_CHUNK_SIZE', 8
+    )
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'мука', 'measurement_unit': 'г'},
+        {'name': 'молоко', 'measurement_unit': 'мл'},
+    ], ensure_ascii=False), encoding='utf-8')
+    load(str(path))
+    assert Ingredient.objects.count() == 2
+
+
+def test_load_rejects_unknown_format(db, tmp_path):
+    path = tmp_path / 'ingredients.xml'
+    path.write_text('<ingredients/>')
+    with pytest.raises(CommandError):
+        load(str(path))
+
+
+def test_load_reports_missing_default_file(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        settings, 'INGREDIENTS_DATA', str(tmp_path / 'ingredients.csv')
+    )
+    with pytest.raises(CommandError, match='INGREDIENTS_DATA'):
+        load()
+
+
+def test_load_refreshes_ingredient_search(anonymous_client, transactional_db,
+                                          tmp_path):
+    assert anonymous_client.get('/api/ingredients/?name=мук').data == []
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('мука,г\n', encoding='utf-8')
+    load(str(path))
+    response = anonymous_client.get('/api/ingredients/?name=мук')
+    assert [item['name'] for item in response.data] == ['мука']
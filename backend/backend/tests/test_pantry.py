@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from api.cache import RECIPE_INGREDIENTS_GENERATION_KEY, get_generation
+from api.indexes import Pantry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import RecipeIngredient
+
+from .test_query_budget import recipe_payload
+
+URL = '/api/recipes/pantry/'
+
+
+def pantry_url(ingredient_ids, **params):
+    query = '&'.join(
+        [f'ingredients={pk}' for pk in ingredient_ids]
+        + [f'{key}={value}' for key, value in params.items()]
+    )
+    return f'{URL}?{query}'
+
+
+def expected_matches(pantry, max_missing=2):
+    recipes = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ):
+        recipes[recipe_id].add(ingredient_id)
+    matches = sorted(
+        (len(ingredients - pantry), -recipe_id)
+        for recipe_id, ingredients in recipes.items()
+        if len(ingredients - pantry) <= max_missing
+    )
+    return [(-recipe_id, missing) for missing, recipe_id in matches]
+
+
+def recipe_ingredients(recipe):
+    return set(recipe.recipeingredient.values_list('ingredient_id', flat=True))
+
+
+def test_recipes_are_ranked_by_coverage(anonymous_client, dataset):
+    pantry = {ingredient.id for ingredient in dataset.ingredients[:30]}
+    response = anonymous_client.get(pantry_url(pantry, limit=100))
+    assert response.status_code == 200
+    expected = expected_matches(pantry)
+    assert expected
+    assert response.data['count'] == len(expected)
+    assert [
+        (recipe['id'], len(recipe['missing_ingredients']))
+        for recipe in response.data['results']
+    ] == expected
+    for recipe in response.data['results']:
+        assert not set(recipe['missing_ingredients']) & pantry
+
+
+def test_missing_ingredients(anonymous_client, dataset):
+    recipe = dataset.recipes[0]
+    ingredients = sorted(recipe_ingredients(recipe))
+    response = anonymous_client.get(pantry_url(ingredients[1:], limit=100))
+    found = {item['id']: item for item in response.data['results']}
+    assert found[recipe.id]['missing_ingredients'] == [ingredients[0]]
+    response = anonymous_client.get(
+        pantry_url(ingredients[1:], max_missing=0, limit=100)
+    )
+    assert recipe.id not in [item['id'] for item in response.data['results']]
+    response = anonymous_client.get(pantry_url(ingredients, limit=100))
+    assert response.data['results'][0]['missing_ingredients'] == []
+
+
+def test_queries_do_not_depend_on_matches(anonymous_client, dataset):
+    anonymous_client.get(pantry_url([dataset.ingredients[0].id]))
+    counts = []
+    for size in (50, 60):
+        pantry = [ingredient.id for ingredient in dataset.ingredients[:size]]
+        with CaptureQueriesContext(connection) as context:
+            response = anonymous_client.get(pantry_url(pantry, limit=30))
+        assert response.data['results']
+        counts.append(len(context))
+    assert counts[0] == counts[1]
+
+
+def test_index_follows_recipe_updates(
+    transactional_db, settings, user_client, dataset
+):
+    settings.RECIPE_IMAGE_ASYNC = False
+    recipe = dataset.own_recipe
+    pantry = {ingredient.id for ingredient in dataset.ingredients[:10]}
+    response = user_client.get(pantry_url(pantry, limit=100))
+    assert recipe.id not in [item['id'] for item in response.data['results']]
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/', recipe_payload(dataset), format='json'
+    )
+    assert response.status_code == 200, response.data
+    response = user_client.get(pantry_url(pantry, limit=100))
+    assert response.data['results'][0]['id'] == recipe.id
+    assert response.data['results'][0]['missing_ingredients'] == []
+
+
+def test_index_applies_changes_without_rebuild(
+    transactional_db, settings, user_client, dataset, monkeypatch
+):
+    settings.RECIPE_IMAGE_ASYNC = False
+    recipe = dataset.own_recipe
+    pantry = {ingredient.id for ingredient in dataset.ingredients[50:]}
+    user_client.get(pantry_url(pantry, limit=100))
+    builds = []
+    monkeypatch.setattr(Pantry, 'build', classmethod(
+        lambda cls: builds.append(cls)
+    ))
+    payload = recipe_payload(dataset)
+    user_client.patch(f'/api/recipes/{recipe.id}/', payload, format='json')
+    generation = get_generation(RECIPE_INGREDIENTS_GENERATION_KEY)
+    payload['name'] = 'Только новое название'
+    assert user_client.patch(
+        f'/api/recipes/{recipe.id}/', payload, format='json'
+    ).status_code == 200
+    assert get_generation(RECIPE_INGREDIENTS_GENERATION_KEY) == generation
+
+    payload = recipe_payload(dataset)
+    payload['ingredients'] = [
+        {'id': pk, 'amount': 10} for pk in sorted(pantry)[:2]
+    ]
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201, response.data
+    new_id = response.data['id']
+    payload['name'] = 'Рецепт из двух ингредиентов'
+    user_client.patch(f'/api/recipes/{recipe.id}/', payload, format='json')
+    response = user_client.get(pantry_url(pantry, limit=100))
+    assert not builds
+    assert [
+        (item['id'], len(item['missing_ingredients']))
+        for item in response.data['results']
+    ] == expected_matches(pantry)
+    assert {new_id, recipe.id} <= {
+        item['id'] for item in response.data['results']
+    }
+    user_client.delete(f'/api/recipes/{new_id}/')
+    response = user_client.get(pantry_url(pantry, limit=100))
+    assert not builds
+    assert new_id not in [item['id'] for item in response.data['results']]
+
+
+def test_short_recipes_match_without_common_ingredients(
+    transactional_db, settings, user_client, dataset
+):
+    settings.RECIPE_IMAGE_ASYNC = False
+    payload = recipe_payload(dataset)
+    payload['ingredients'] = [
+        {'id': ingredient.id, 'amount': 10}
+        for ingredient in dataset.ingredients[:2]
+    ]
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201, response.data
+    pantry = [dataset.ingredients[-1].id]
+    found = {
+        item['id']: item['missing_ingredients']
+        for item in user_client.get(
+            pantry_url(pantry, limit=100)
+        ).data['results']
+    }
+    assert len(found[response.data['id']]) == 2
+    found = user_client.get(pantry_url(pantry, max_missing=1)).data
+    assert response.data['id'] not in [
+        item['id'] for item in found['results']
+    ]
+
+
+def test_invalid_params(anonymous_client, dataset):
+    assert anonymous_client.get(URL).status_code == 400
+    response = anonymous_client.get(
+        pantry_url([dataset.ingredients[0].id], max_missing=3)
+    )
+    assert response.status_code == 400
@@ -0,0 +1,307 @@
+import time
+from collections import namedtuple
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Recipe, Subscription
+
+from .conftest import IMAGE
+
+TIME_BUDGET = 0.5
+
+Endpoint = namedtuple(
+    'Endpoint',
+    'name method url data anonymous_budget user_budget'
+)
+
+
+def recipe_payload(dataset):
+    return {
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in dataset.ingredients[:10]
+        ],
+        'tags': [tag.id for tag in dataset.tags],
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта',
+        'cooking_time': 15,
+    }
+
+
+ENDPOINTS = [
+    Endpoint('tags-list', 'get',
+             lambda d: '/api/tags/', None, 1, 2),
+    Endpoint('tags-detail', 'get',
+             lambda d: f'/api/tags/{d.tags[0].id}/', None, 1, 2),
+    Endpoint('ingredients-list', 'get',
+             lambda d: '/api/ingredients/?name=ингредиент', None, 1, 2),
+    Endpoint('ingredients-detail', 'get',
+             lambda d: f'/api/ingredients/{d.ingredients[0].id}/',
+             None, 1, 2),
+    Endpoint('recipes-list', 'get',
+             lambda d: '/api/recipes/', None, 4, 5),
+    Endpoint('recipes-list-limit', 'get',
+             lambda d: '/api/recipes/?limit=30', None, 4, 5),
+    Endpoint('recipes-list-cursor', 'get',
+             lambda d: '/api/recipes/?pagination=cursor', None, 3, 4),
+    Endpoint('recipes-list-filtered', 'get',
+             lambda d: '/api/recipes/?tags=tag0&tags=tag1&is_favorited=1'
+                       '&is_in_shopping_cart=0',
+             None, 5, 6),
+    Endpoint('recipes-list-name', 'get',
+             lambda d: '/api/recipes/?name=рецепт', None, 4, 5),
+    Endpoint('recipes-pantry', 'get',
+             lambda d: '/api/recipes/pantry/?' + '&'.join(
+                 f'ingredients={ingredient.id}'
+                 for ingredient in d.ingredients[:50]
+             ), None, 4, 5),
+    Endpoint('recipes-similar', 'get',
+             lambda d: f'/api/recipes/{d.recipes[0].id}/similar/',
+             None, 4, 5),
+    Endpoint('recipes-detail', 'get',
+             lambda d: f'/api/recipes/{d.recipes[0].id}/', None, 3, 4),
+    Endpoint('recipes-create', 'post',
+             lambda d: '/api/recipes/', recipe_payload, 0, 19),
+    Endpoint('recipes-update', 'patch',
+             lambda d: f'/api/recipes/{d.own_recipe.id}/',
+             recipe_payload, 0, 23),
+    Endpoint('recipes-delete', 'delete',
+             lambda d: f'/api/recipes/{d.own_recipe.id}/', None, 0, 13),
+    Endpoint('favorite-add', 'post',
+             lambda d: f'/api/recipes/{d.recipes[-1].id}/favorite/',
+             None, 0, 7),
+    Endpoint('favorite-remove', 'delete',
+             lambda d: f'/api/recipes/{d.recipes[0].id}/favorite/',
+             None, 0, 7),
+    Endpoint('shopping-cart-add', 'post',
+             lambda d: f'/api/recipes/{d.recipes[-1].id}/shopping_cart/',
+             None, 0, 11),
+    Endpoint('shopping-cart-remove', 'delete',
+             lambda d: f'/api/recipes/{d.recipes[0].id}/shopping_cart/',
+             None, 0, 12),
+    Endpoint('favorite-bulk-add', 'post',
+             lambda d: '/api/recipes/favorite/bulk/',
+             lambda d: {'ids': [recipe.id for recipe in d.recipes]},
+             0, 7),
+    Endpoint('shopping-cart-bulk-add', 'post',
+             lambda d: '/api/recipes/shopping_cart/bulk/',
+             lambda d: {'ids': [recipe.id for recipe in d.recipes]},
+             0, 12),
+    Endpoint('download-shopping-cart', 'get',
+             lambda d: '/api/recipes/download_shopping_cart/', None, 0, 2),
+    Endpoint('feed', 'get',
+             lambda d: '/api/recipes/feed/', None, 0, 6),
+    Endpoint('subscriptions', 'get',
+             lambda d: '/api/users/subscriptions/', None, 0, 4),
+    Endpoint('subscriptions-recipes-limit', 'get',
+             lambda d: '/api/users/subscriptions/?recipes_limit=2',
+             None, 0, 4),
+    Endpoint('subscriptions-cursor', 'get',
+             lambda d: '/api/users/subscriptions/?pagination=cursor',
+             None, 0, 3),
+    Endpoint('subscribe', 'post',
+             lambda d: f'/api/users/{d.authors[-1].id}/subscribe/',
+             None, 0, 9),
+    Endpoint('unsubscribe', 'delete',
+             lambda d: f'/api/users/{d.authors[0].id}/subscribe/',
+             None, 0, 6),
+    Endpoint('users-list', 'get',
+             lambda d: '/api/users/', None, 2, 9),
+    Endpoint('users-detail', 'get',
+             lambda d: f'/api/users/{d.authors[0].id}/', None, 0, 3),
+    Endpoint('users-me', 'get',
+             lambda d: '/api/users/me/', None, 0, 2),
+]
+
+
+def call(client, endpoint, dataset):
+    data = endpoint.data(dataset) if endpoint.data else None
+    return getattr(client, endpoint.method)(
+        endpoint.url(dataset), data=data, format='json'
+    )
+
+
+@pytest.mark.parametrize(
+    'endpoint', ENDPOINTS, ids=[endpoint.name for endpoint in ENDPOINTS]
+)
+@pytest.mark.parametrize('client_name', ['anonymous_client', 'user_client'])
+def test_endpoint_budget(request, dataset, endpoint, client_name):
+    client = request.getfixturevalue(client_name)
+    budget = (
+        endpoint.user_budget if client_name == 'user_client'
+        else endpoint.anonymous_budget
+    )
+    with CaptureQueriesContext(connection) as context:
+        started = time.perf_counter()
+        response = call(client, endpoint, dataset)
+        elapsed = time.perf_counter() - started
+    assert response.status_code < 500, response.content
+    if client_name == 'user_client':
+        assert response.status_code < 400, response.content
+    queries = '\n'.join(query['sql'] for query in context.captured_queries)
+    assert len(context) <= budget, (
+        f'{endpoint.name}: {len(context)} запросов при бюджете {budget}\n'
+        f'{queries}'
+    )
+    assert elapsed <= TIME_BUDGET, (
+        f'{endpoint.name}: {elapsed:.3f}с при бюджете {TIME_BUDGET}с'
+    )
+
+
+@pytest.mark.parametrize('client_name', ['anonymous_client', 'user_client'])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+    request, dataset, client_name
+):
+    client = request.getfixturevalue(client_name)
+    counts = []
+    for limit in (1, len(dataset.recipes)):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(f'/api/recipes/?limit={limit}')
+        assert response.status_code == 200
+        counts.append(len(context))
+    assert counts[0] == counts[1]
+
+
+def test_recipe_cursor_pages_cover_all_recipes(anonymous_client, dataset):
+    url = '/api/recipes/?pagination=cursor&limit=7'
+    ids = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            response = anonymous_client.get(url)
+        assert response.status_code == 200
+        assert count_queries(context) == 0
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        url = response.data['next']
+    assert ids == sorted(
+        (recipe.id for recipe in dataset.recipes + [dataset.own_recipe]),
+        reverse=True
+    )
+
+
+def count_queries(context):
+    return sum('COUNT(' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.parametrize(
+    'params', ['search=рецепт', 'ordering=-favorites_count', 'name=рец']
+)
+def test_recipe_cursor_rejects_custom_order(anonymous_client, dataset, params):
+    url = f'/api/recipes/?{params}'
+    assert anonymous_client.get(f'{url}&pagination=cursor').status_code == 400
+    response = anonymous_client.get(url)
+    assert response.status_code == 200
+    response = anonymous_client.get(
+        f'/api/recipes/?pagination=cursor&{params.split("=")[0]}='
+    )
+    assert response.status_code == 200
+
+
+def test_recipe_count_is_cached_per_user_and_invalidated(user_client, dataset):
+    url = '/api/recipes/?is_favorited=1'
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(url)
+    assert response.data['count'] == len(dataset.user.favorite.all())
+    assert count_queries(context) == 1
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(url)
+    assert count_queries(context) == 0
+    user_client.post(f'/api/recipes/{dataset.recipes[-1].id}/favorite/')
+    response = user_client.get(url)
+    assert response.data['count'] == len(dataset.user.favorite.all())
+
+
+def test_recipe_detail_is_served_from_cache(
+    transactional_db, user_client, dataset
+):
+    recipe = dataset.recipes[0]
+    url = f'/api/recipes/{recipe.id}/'
+    expected = user_client.get(url).data
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(url)
+    assert response.data == expected
+    assert len(context) == 2
+    assert response.data['is_favorited']
+    assert response.data['image'].startswith('http://testserver/media/')
+
+    user_client.delete(f'/api/recipes/{recipe.id}/favorite/')
+    assert not user_client.get(url).data['is_favorited']
+
+    recipe.name = 'Новое название'
+    recipe.save()
+    assert user_client.get(url).data['name'] == 'Новое название'
+    dataset.tags[0].recipes.clear()
+    tags = user_client.get(url).data['tags']
+    assert dataset.tags[0].id not in [tag['id'] for tag in tags]
+
+
+def test_recipe_detail_cache_key_uses_numeric_id(
+    transactional_db, anonymous_client, dataset
+):
+    recipe = dataset.recipes[0]
+    assert anonymous_client.get(f'/api/recipes/0{recipe.id}/').data
+    recipe.name = 'Новое название'
+    recipe.save()
+    response = anonymous_client.get(f'/api/recipes/0{recipe.id}/')
+    assert response.data['name'] == 'Новое название'
+    assert anonymous_client.get('/api/recipes/abc/').status_code == 404
+
+
+@pytest.mark.parametrize('recipes_limit', ['', '&recipes_limit=2'])
+def test_subscriptions_queries_do_not_depend_on_page_size(
+    user_client, dataset, recipes_limit
+):
+    counts = []
+    for limit in (1, len(dataset.authors)):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(
+                f'/api/users/subscriptions/?limit={limit}{recipes_limit}'
+            )
+        assert response.status_code == 200
+        counts.append(len(context))
+    assert counts[0] == counts[1]
+    for author in response.data['results']:
+        recipes = Recipe.objects.filter(author_id=author['id'])
+        if recipes_limit:
+            recipes = recipes[:2]
+        assert [recipe['id'] for recipe in author['recipes']] == [
+            recipe.id for recipe in recipes
+        ]
+
+
+def test_subscriptions_recipes_limit_without_subscriptions(
+    user_client, dataset
+):
+    Subscription.objects.filter(user=dataset.user).delete()
+    response = user_client.get('/api/users/subscriptions/?recipes_limit=3')
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
+def test_estimated_count_does_not_hide_last_pages(
+    monkeypatch, anonymous_client, dataset
+):
+    monkeypatch.setattr(
+        'api.paginators.CachedCountPaginator.estimate_count',
+        lambda paginator: 12
+    )
+    total = Recipe.objects.count()
+    assert total > 15
+    response = anonymous_client.get('/api/recipes/?limit=5')
+    assert response.data['count'] == 12
+    assert response.data['next'] is not None
+    # Последняя страница по оценке: количество пересчитывается точно.
+    response = anonymous_client.get('/api/recipes/?limit=5&page=3')
+    assert response.data['count'] == total
+    assert response.data['next'] is not None
+    last_page = (total + 4) // 5
+    response = anonymous_client.get(f'/api/recipes/?limit=5&page={last_page}')
+    assert response.status_code == 200
+    assert response.data['next'] is None
+    response = anonymous_client.get(
+        f'/api/recipes/?limit=5&page={last_page + 1}'
+    )
+    assert response.status_code == 404
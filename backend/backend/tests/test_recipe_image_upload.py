@@ -0,0 +1,110 @@
+from io import BytesIO
+
+import pytest
+from api.uploads import LimitedUploadHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from foodgram.models import Recipe
+from PIL import Image
+from rest_framework.test import APIClient
+from users.models import User
+
+from .conftest import IMAGE
+from .test_query_budget import recipe_payload
+
+URL = '/api/recipes/images/'
+
+
+def image_file(size=(40, 30), image_format='PNG', name='photo.png'):
+    content = BytesIO()
+    Image.new('RGB', size).save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def test_upload_returns_token_accepted_by_recipe(user_client, dataset):
+    response = user_client.post(
+        URL, {'image': image_file()}, format='multipart'
+    )
+    assert response.status_code == 201, response.data
+    assert response.data['format'] == 'PNG'
+    assert (response.data['width'], response.data['height']) == (40, 30)
+    response = user_client.post(
+        '/api/recipes/',
+        {**recipe_payload(dataset), 'image': response.data['image']},
+        format='json'
+    )
+    assert response.status_code == 201, response.data
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image.name.startswith('recipes/')
+    assert recipe.image.name.endswith('.png')
+    assert recipe.image.width == 40
+
+
+def test_raw_upload(user_client):
+    response = user_client.post(
+        URL,
+        image_file(image_format='JPEG').read(),
+        content_type='image/jpeg',
+        HTTP_CONTENT_DISPOSITION='attachment; filename=photo.jpg'
+    )
+    assert response.status_code == 201, response.data
+    assert response.data['format'] == 'JPEG'
+
+
+def test_base64_is_still_accepted(user_client, dataset):
+    response = user_client.post(
+        '/api/recipes/',
+        {**recipe_payload(dataset), 'image': IMAGE},
+        format='json'
+    )
+    assert response.status_code == 201, response.data
+
+
+def test_too_large_is_rejected_before_reading(settings, user_client):
+    settings.RECIPE_IMAGE_MAX_SIZE = 100
+    response = user_client.post(
+        URL, {'image': image_file(size=(400, 400))}, format='multipart'
+    )
+    assert response.status_code == 413
+
+
+def test_handler_stops_on_limit():
+    handler = LimitedUploadHandler(max_size=10)
+    handler.new_file('image', 'photo.png', 'image/png', None)
+    handler.receive_data_chunk(b'x' * 10, 0)
+    with pytest.raises(StopUpload):
+        handler.receive_data_chunk(b'x', 10)
+    assert handler.exceeded
+
+
+@pytest.mark.parametrize('upload, message', [
+    (SimpleUploadedFile('photo.png', b'not an image'), 'картинкой'),
+    (image_file(image_format='BMP', name='photo.bmp'), 'BMP'),
+    (image_file(size=(9000, 10)), 'пикселей'),
+])
+def test_invalid_upload(user_client, upload, message):
+    response = user_client.post(URL, {'image': upload}, format='multipart')
+    assert response.status_code == 400
+    assert message in response.data['errors'][0]
+
+
+def test_foreign_token_is_rejected(user_client, dataset):
+    other = APIClient()
+    other.force_authenticate(User.objects.exclude(pk=dataset.user.pk)[0])
+    token = other.post(
+        URL, {'image': image_file()}, format='multipart'
+    ).data['image']
+    response = user_client.post(
+        '/api/recipes/',
+        {**recipe_payload(dataset), 'image': token},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert 'image' in response.data
+
+
+def test_anonymous(anonymous_client):
+    response = anonymous_client.post(
+        URL, {'image': image_file()}, format='multipart'
+    )
+    assert response.status_code == 401
@@ -0,0 +1,81 @@
+import base64
+import os
+from io import BytesIO
+
+import pytest
+from django.core.management import call_command
+from foodgram.models import Recipe
+from PIL import Image
+
+from .conftest import IMAGE
+from .test_query_budget import recipe_payload
+
+
+def other_image():
+    content = BytesIO()
+    Image.new('RGB', (20, 10), 'red').save(content, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        content.getvalue()
+    ).decode()
+
+
+@pytest.fixture
+def sync_images(settings):
+    settings.RECIPE_IMAGE_ASYNC = False
+
+
+def test_renditions_are_generated_after_commit(
+    transactional_db, sync_images, settings, user_client, dataset
+):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(dataset), format='json'
+    )
+    assert response.status_code == 201, response.data
+    images = user_client.get(f'/api/recipes/{response.data["id"]}/').data[
+        'images'
+    ]
+    assert set(images) == set(settings.RECIPE_IMAGE_RENDITIONS)
+    for files in images.values():
+        assert set(files) == set(settings.RECIPE_IMAGE_FORMATS)
+        for extension, url in files.items():
+            assert url.startswith('http://testserver/media/')
+            path = url.replace('http://testserver/media/', '')
+            assert os.path.exists(os.path.join(settings.MEDIA_ROOT, path))
+
+    response = user_client.patch(
+        f'/api/recipes/{response.data["id"]}/',
+        {**recipe_payload(dataset), 'image': IMAGE},
+        format='json'
+    )
+    assert response.data['images'] == images
+
+    response = user_client.patch(
+        f'/api/recipes/{response.data["id"]}/',
+        {**recipe_payload(dataset), 'image': other_image()},
+        format='json'
+    )
+    assert response.data['images'] is None
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    detail = user_client.get(f'/api/recipes/{recipe.id}/').data
+    assert detail['images'] is not None
+    assert recipe.image.name in recipe.image_renditions
+
+
+def test_images_are_empty_until_processed(user_client, dataset):
+    recipe = dataset.recipes[0]
+    response = user_client.get(f'/api/recipes/{recipe.id}/')
+    assert response.data['images'] is None
+
+
+def test_process_recipe_images_command(
+    sync_images, settings, user_client, dataset
+):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(dataset), format='json'
+    )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert not recipe.image_renditions
+    Recipe.objects.exclude(pk=recipe.pk).update(image='')
+    call_command('process_recipe_images')
+    recipe.refresh_from_db()
+    assert recipe.image.name in recipe.image_renditions
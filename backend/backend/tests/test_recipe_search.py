@@ -0,0 +1,59 @@
+from foodgram.models import Recipe
+
+URL = '/api/recipes/'
+
+
+def create_recipe(dataset, name, text):
+    recipe = Recipe.objects.create(
+        name=name,
+        text=text,
+        author=dataset.authors[0],
+        image='recipes/image.png',
+        cooking_time=10
+    )
+    recipe.tags.set([dataset.tags[0]])
+    return recipe
+
+
+def result_ids(response):
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_name_matches_rank_above_text_matches(anonymous_client, dataset):
+    in_text = create_recipe(dataset, 'Суп', 'Добавить тыква и морковь')
+    in_name = create_recipe(dataset, 'тыква запечённая', 'В духовке')
+    create_recipe(dataset, 'Салат', 'Огурцы')
+    response = anonymous_client.get(f'{URL}?search=тыква')
+    assert result_ids(response) == [in_name.id, in_text.id]
+    assert response.data['count'] == 2
+
+
+def test_all_words_must_match(anonymous_client, dataset):
+    both = create_recipe(dataset, 'Суп тыква', 'морковь')
+    create_recipe(dataset, 'Суп', 'тыква')
+    response = anonymous_client.get(f'{URL}?search=тыква морковь')
+    assert result_ids(response) == [both.id]
+
+
+def test_search_combines_with_filters(anonymous_client, dataset):
+    tagged = create_recipe(dataset, 'тыква первая', '')
+    other = create_recipe(dataset, 'тыква вторая', '')
+    other.tags.set([dataset.tags[1]])
+    response = anonymous_client.get(
+        f'{URL}?search=тыква&tags={dataset.tags[0].slug}'
+    )
+    assert result_ids(response) == [tagged.id]
+
+
+def test_search_paginates(anonymous_client, dataset):
+    recipes = [create_recipe(dataset, f'тыква {number}', '')
+               for number in range(5)]
+    response = anonymous_client.get(f'{URL}?search=тыква&limit=2&page=2')
+    assert response.data['count'] == 5
+    assert result_ids(response) == [recipe.id for recipe in recipes][::-1][2:4]
+
+
+def test_empty_search_is_ignored(anonymous_client, dataset):
+    response = anonymous_client.get(f'{URL}?search=%20')
+    assert response.data['count'] == Recipe.objects.count()
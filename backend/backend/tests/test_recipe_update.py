@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import RecipeIngredient
+
+from .conftest import IMAGE
+
+
+def payload(dataset, ingredients):
+    recipe = dataset.own_recipe
+    return {
+        'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in ingredients
+        ],
+        'tags': [tag.id for tag in dataset.tags[:2]],
+        'image': IMAGE,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def stored_ingredients(recipe):
+    return dict(RecipeIngredient.objects.filter(
+        recipe=recipe
+    ).values_list('ingredient', 'amount'))
+
+
+def test_update_applies_ingredient_diff(user_client, dataset):
+    recipe = dataset.own_recipe
+    url = f'/api/recipes/{recipe.id}/'
+    ingredients = dataset.ingredients[:30]
+    response = user_client.patch(url, payload(
+        dataset, [(ingredient, 10) for ingredient in ingredients]
+    ), format='json')
+    assert response.status_code == 200, response.data
+    kept_ids = set(RecipeIngredient.objects.filter(
+        recipe=recipe, ingredient__in=ingredients[:20]
+    ).values_list('id', flat=True))
+
+    new = [(ingredient, 10) for ingredient in ingredients[:10]]
+    new += [(ingredient, 20) for ingredient in ingredients[10:20]]
+    new += [(ingredient, 5) for ingredient in dataset.ingredients[30:40]]
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.patch(
+            url, payload(dataset, new), format='json'
+        )
+    assert response.status_code == 200, response.data
+    assert len(context) <= 23
+    assert stored_ingredients(recipe) == {
+        ingredient.id: amount for ingredient, amount in new
+    }
+    assert kept_ids <= set(RecipeIngredient.objects.filter(
+        recipe=recipe
+    ).values_list('id', flat=True))
+    assert sorted(
+        (item['id'], item['amount']) for item in response.data['ingredients']
+    ) == sorted((ingredient.id, amount) for ingredient, amount in new)
+    assert {tag['id'] for tag in response.data['tags']} == {
+        tag.id for tag in dataset.tags[:2]
+    }
+
+
+def test_ingredient_validation(user_client, dataset):
+    url = f'/api/recipes/{dataset.own_recipe.id}/'
+    ingredient = dataset.ingredients[0]
+    response = user_client.patch(url, payload(
+        dataset, [(ingredient, 1), (ingredient, 2)]
+    ), format='json')
+    assert response.status_code == 400
+    data = payload(dataset, [(ingredient, 1)])
+    data['ingredients'].append({'id': 10 ** 6, 'amount': 1})
+    assert user_client.patch(url, data, format='json').status_code == 404
+    assert stored_ingredients(dataset.own_recipe) == {}
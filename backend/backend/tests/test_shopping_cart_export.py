@@ -0,0 +1,107 @@
+import csv
+from io import StringIO
+
+import pytest
+from django.db.models import Sum
+from foodgram.models import (Ingredient, RecipeIngredient,
+                             ShoppingListIngredient)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+def expected_rows(user):
+    return list(RecipeIngredient.objects.filter(
+        recipe__shoppinglist__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount')).order_by('ingredient__name'))
+
+
+def content(response):
+    return b''.join(response.streaming_content)
+
+
+def test_txt_is_default(user_client, dataset):
+    response = user_client.get(URL)
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    assert 'shopping_list.txt' in response['Content-Disposition']
+    lines = content(response).decode().split('\n')
+    assert lines == [
+        f'{row["ingredient__name"]} - {row["amount"]} '
+        f'{row["ingredient__measurement_unit"]}'
+        for row in expected_rows(dataset.user)
+    ]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'path': f'{URL}?format=csv'},
+    {'path': URL, 'HTTP_ACCEPT': 'text/csv'},
+])
+def test_csv(user_client, dataset, kwargs):
+    response = user_client.get(**kwargs)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert 'shopping_list.csv' in response['Content-Disposition']
+    rows = list(csv.reader(StringIO(content(response).decode('utf-8-sig'))))
+    assert rows[0] == ['Ингредиент', 'Количество', 'Единица измерения']
+    assert rows[1:] == [
+        [row['ingredient__name'], str(row['amount']),
+         row['ingredient__measurement_unit']]
+        for row in expected_rows(dataset.user)
+    ]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'path': f'{URL}?format=pdf'},
+    {'path': URL, 'HTTP_ACCEPT': 'application/pdf'},
+])
+def test_pdf(user_client, kwargs):
+    response = user_client.get(**kwargs)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/pdf'
+    assert 'shopping_list.pdf' in response['Content-Disposition']
+    body = content(response)
+    assert body.startswith(b'%PDF')
+    assert body.rstrip().endswith(b'%%EOF')
+
+
+def test_unknown_accept_falls_back_to_txt(user_client):
+    response = user_client.get(URL, HTTP_ACCEPT='image/png')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+
+
+def test_not_modified(user_client, dataset):
+    etag = user_client.get(URL)['ETag']
+    assert etag != user_client.get(f'{URL}?format=csv')['ETag']
+    response = user_client.get(URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    user_client.post(f'/api/recipes/{dataset.recipes[-1].id}/shopping_cart/')
+    response = user_client.get(URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_anonymous(anonymous_client, dataset):
+    assert anonymous_client.get(URL).status_code == 401
+
+
+def test_etag_follows_amounts_and_ingredient_names(user_client, dataset):
+    items = list(ShoppingListIngredient.objects.filter(
+        user=dataset.user
+    ).order_by('ingredient_id')[:2])
+    first, second = items
+    etag = user_client.get(URL)['ETag']
+    # Суммы по id и количествам совпадают, строки - нет.
+    first.amount, second.amount = second.amount + 1, first.amount - 1
+    ShoppingListIngredient.objects.bulk_update(items, ['amount'])
+    response = user_client.get(URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response['ETag']
+    Ingredient.objects.filter(pk=first.ingredient_id).update(
+        measurement_unit='кг'
+    )
+    assert user_client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
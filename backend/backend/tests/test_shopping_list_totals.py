@@ -0,0 +1,93 @@
+import pytest
+from django.core.management import call_command
+from django.db.models import Sum
+from foodgram.models import RecipeIngredient, ShoppingListIngredient
+
+from .conftest import IMAGE
+
+
+def expected_totals(user):
+    return dict(RecipeIngredient.objects.filter(
+        recipe__shoppinglist__user=user
+    ).order_by().values('ingredient').annotate(
+        total=Sum('amount')
+    ).values_list('ingredient', 'total'))
+
+
+def stored_totals(user):
+    return dict(ShoppingListIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient', 'amount'))
+
+
+def test_totals_follow_shopping_cart_toggles(user_client, dataset):
+    user = dataset.user
+    assert stored_totals(user) == expected_totals(user)
+    recipe = dataset.recipes[-1]
+    url = f'/api/recipes/{recipe.id}/shopping_cart/'
+    assert user_client.post(url).status_code == 201
+    assert stored_totals(user) == expected_totals(user)
+    assert user_client.post(url).status_code == 400
+    assert stored_totals(user) == expected_totals(user)
+    assert user_client.delete(url).status_code == 204
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_totals_follow_bulk_toggles(user_client, dataset):
+    user = dataset.user
+    url = '/api/recipes/shopping_cart/bulk/'
+    ids = [recipe.id for recipe in dataset.recipes]
+    user_client.post(url, {'ids': ids}, format='json')
+    assert stored_totals(user) == expected_totals(user)
+    user_client.delete(url, {'ids': ids[::2]}, format='json')
+    assert stored_totals(user) == expected_totals(user)
+    user_client.delete(url, {'ids': ids}, format='json')
+    assert stored_totals(user) == {}
+
+
+def test_totals_follow_recipe_update_and_delete(user_client, dataset):
+    user = dataset.user
+    recipe = dataset.own_recipe
+    user_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+    ingredients = dataset.ingredients
+    response = user_client.patch(f'/api/recipes/{recipe.id}/', {
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 1000},
+            {'id': ingredients[-1].id, 'amount': 7},
+        ],
+        'tags': [dataset.tags[0].id],
+        'image': IMAGE,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }, format='json')
+    assert response.status_code == 200, response.data
+    assert stored_totals(user) == expected_totals(user)
+    assert stored_totals(user)[ingredients[-1].id] >= 7
+    assert user_client.delete(
+        f'/api/recipes/{recipe.id}/'
+    ).status_code == 204
+    assert stored_totals(user) == expected_totals(user)
+
+
+@pytest.mark.parametrize('args', [[], ['--user']])
+def test_reconcile_command(dataset, args):
+    user = dataset.user
+    expected = expected_totals(user)
+    ShoppingListIngredient.objects.filter(user=user).update(amount=1)
+    ShoppingListIngredient.objects.filter(user=user).first().delete()
+    if args:
+        args.append(str(user.id))
+    call_command('reconcile_shopping_list', *args)
+    assert stored_totals(user) == expected
+
+
+def test_reconcile_all_users_in_batches(dataset):
+    expected = set(ShoppingListIngredient.objects.values_list(
+        'user_id', 'ingredient_id', 'amount'
+    ))
+    ShoppingListIngredient.objects.update(amount=1)
+    call_command('reconcile_shopping_list', '--batch-size', '2')
+    assert set(ShoppingListIngredient.objects.values_list(
+        'user_id', 'ingredient_id', 'amount'
+    )) == expected
@@ -0,0 +1,92 @@
+from foodgram.models import Recipe, RecipeIngredient, SimilarityBucket
+from foodgram.similarity import jaccard
+
+from .test_query_budget import recipe_payload
+
+
+def url(recipe, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return f'/api/recipes/{recipe.id}/similar/?{query}'
+
+
+def ingredient_sets():
+    sets = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ):
+        sets.setdefault(recipe_id, set()).add(ingredient_id)
+    return sets
+
+
+def test_similar_recipes_are_ranked_by_jaccard(anonymous_client, dataset):
+    recipe = dataset.recipes[0]
+    near = Recipe.objects.create(
+        name='Почти такой же',
+        author=dataset.authors[1],
+        image='recipes/image.png',
+        text='Описание',
+        cooking_time=10
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=near, ingredient_id=item.ingredient_id,
+                         amount=1)
+        for item in recipe.recipeingredient.all()[1:]
+    )
+    SimilarityBucket.objects.update_recipes([near.id])
+    response = anonymous_client.get(url(recipe, limit=50))
+    assert response.status_code == 200
+    sets = ingredient_sets()
+    assert response.data[0]['id'] == near.id
+    scores = [item['similarity'] for item in response.data]
+    assert scores == sorted(scores, reverse=True)
+    for item in response.data:
+        assert item['id'] != recipe.id
+        assert set(item) == {
+            'id', 'name', 'image', 'images', 'cooking_time', 'similarity'
+        }
+        assert item['similarity'] == round(
+            jaccard(sets[recipe.id], sets[item['id']]), 3
+        )
+
+
+def test_copy_is_most_similar(user_client, dataset):
+    response = user_client.post(
+        '/api/recipes/', recipe_payload(dataset), format='json'
+    )
+    copy = user_client.post(
+        '/api/recipes/',
+        {**recipe_payload(dataset), 'name': 'Копия'},
+        format='json'
+    )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    response = user_client.get(url(recipe, limit=1))
+    assert response.data == [{
+        **response.data[0], 'id': copy.data['id'], 'similarity': 1.0
+    }]
+
+
+def test_buckets_follow_ingredient_changes(user_client, dataset):
+    recipe = dataset.own_recipe
+    assert not SimilarityBucket.objects.filter(recipe=recipe).exists()
+    user_client.patch(
+        f'/api/recipes/{recipe.id}/', recipe_payload(dataset), format='json'
+    )
+    buckets = set(SimilarityBucket.objects.filter(
+        recipe=recipe
+    ).values_list('bucket', flat=True))
+    SimilarityBucket.objects.update_recipes([recipe.id])
+    assert buckets == set(SimilarityBucket.objects.filter(
+        recipe=recipe
+    ).values_list('bucket', flat=True))
+    assert buckets
+
+
+def test_limit_validation(anonymous_client, dataset):
+    recipe = dataset.recipes[0]
+    assert anonymous_client.get(url(recipe, limit=0)).status_code == 400
+    assert anonymous_client.get(url(recipe, limit=51)).status_code == 400
+    assert len(anonymous_client.get(url(recipe, limit=2)).data) <= 2
+
+
+def test_unknown_recipe(anonymous_client, dataset):
+    assert anonymous_client.get('/api/recipes/0/similar/').status_code == 404
@@ -0,0 +1,44 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Recipe, Tag
+
+URL = '/api/recipes/'
+
+
+def test_multiple_tags_do_not_duplicate_recipes(anonymous_client, dataset):
+    slugs = [tag.slug for tag in dataset.tags[:2]]
+    response = anonymous_client.get(
+        f'{URL}?limit=100&' + '&'.join(f'tags={slug}' for slug in slugs)
+    )
+    assert response.status_code == 200
+    ids = [recipe['id'] for recipe in response.data['results']]
+    expected = list(Recipe.objects.filter(
+        tags__slug__in=slugs
+    ).distinct().order_by('-id').values_list('id', flat=True))
+    assert ids == expected
+    assert response.data['count'] == len(expected)
+
+
+def test_tag_slugs_are_resolved_without_queries(anonymous_client, dataset):
+    anonymous_client.get(f'{URL}?tags={dataset.tags[0].slug}')
+    with CaptureQueriesContext(connection) as context:
+        anonymous_client.get(f'{URL}?tags={dataset.tags[1].slug}')
+    assert not any(
+        '"foodgram_tag"."slug" IN' in query['sql']
+        for query in context.captured_queries
+    )
+
+
+def test_unknown_tag(anonymous_client, dataset):
+    assert anonymous_client.get(f'{URL}?tags=unknown').status_code == 400
+
+
+def test_new_tag_is_available(transactional_db, anonymous_client, dataset):
+    anonymous_client.get(f'{URL}?tags={dataset.tags[0].slug}')
+    tag = Tag.objects.create(name='Новый', slug='new', color='#111111')
+    dataset.recipes[0].tags.add(tag)
+    response = anonymous_client.get(f'{URL}?tags=new')
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        dataset.recipes[0].id
+    ]
@@ -0,0 +1,60 @@
+import pytest
+from foodgram.models import Favorite, ShoppingList, Subscription
+
+
+@pytest.mark.parametrize('url, model', [
+    ('/api/recipes/{}/favorite/', Favorite),
+    ('/api/recipes/{}/shopping_cart/', ShoppingList),
+])
+def test_recipe_toggle_semantics(user_client, dataset, url, model):
+    recipe = dataset.recipes[-1]
+    url = url.format(recipe.id)
+    assert user_client.post(url).status_code == 201
+    response = user_client.post(url)
+    assert response.status_code == 400
+    assert list(response.data) == ['errors']
+    assert model.objects.filter(user=dataset.user, recipe=recipe).count() == 1
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    missing_url = url.replace(str(recipe.id), '0')
+    assert user_client.post(missing_url).status_code == 404
+    assert user_client.delete(missing_url).status_code == 404
+
+
+def test_subscribe_toggle_semantics(user_client, dataset):
+    author = dataset.authors[-1]
+    url = f'/api/users/{author.id}/subscribe/'
+    assert user_client.post(url).status_code == 201
+    assert user_client.post(url).status_code == 400
+    assert Subscription.objects.filter(
+        user=dataset.user, author=author
+    ).count() == 1
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    assert user_client.post(
+        f'/api/users/{dataset.user.id}/subscribe/'
+    ).status_code == 400
+    assert user_client.delete('/api/users/0/subscribe/').status_code == 404
+
+
+@pytest.mark.parametrize('url, model', [
+    ('/api/recipes/favorite/bulk/', Favorite),
+    ('/api/recipes/shopping_cart/bulk/', ShoppingList),
+])
+def test_recipe_bulk_toggle(user_client, dataset, url, model):
+    present = model.objects.filter(user=dataset.user).first().recipe_id
+    absent = dataset.recipes[-1].id
+    data = {'ids': [present, absent, absent, 10 ** 6]}
+    response = user_client.post(url, data, format='json')
+    assert response.status_code == 200
+    assert response.data['results'] == [
+        {'id': present, 'status': 'exists'},
+        {'id': absent, 'status': 'added'},
+        {'id': 10 ** 6, 'status': 'not_found'},
+    ]
+    assert model.objects.filter(user=dataset.user, recipe_id=absent).exists()
+    response = user_client.delete(url, {'ids': [absent]}, format='json')
+    assert response.data['results'] == [{'id': absent, 'status': 'removed'}]
+    response = user_client.delete(url, {'ids': [absent]}, format='json')
+    assert response.data['results'] == [{'id': absent, 'status': 'missing'}]
+    assert user_client.post(url, {'ids': []}, format='json').status_code == 400
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:33
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('id')
+        ).values('total')
+    ), 0)
+
+
+def fill_user_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    Subscription = apps.get_model('foodgram', 'Subscription')
+    User.objects.update(
+        recipes_count=count_related(Recipe, 'author'),
+        subscribers_count=count_related(Subscription, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('foodgram', '0022_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.RunPython(fill_user_counters, migrations.RunPython.noop),
+    ]
@@ -10,7 +10,27 @@ ROLE_CHOICES = [
 ]
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Счётчики из counter_fields меняются только атомарными UPDATE.
+    Обычное сохранение существующей записи их не трогает, чтобы
+    не затереть изменения, сделанные после чтения объекта.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """
     Новая модель пользователя, унаследованная от AbstractUser. В модели
     присутствуют новые поля, расширяющие исходную Django-модель:
@@ -48,6 +68,18 @@ class User(AbstractUser):
         max_length=150,
         blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     @property
     def is_user(self):
@@ -26,6 +26,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         if self.context.get("request"):
             user = self.context.get("request").user
         else: